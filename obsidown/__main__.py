@@ -1,14 +1,47 @@
 import argparse
 
-from .main import main
+from .main import main, main_many
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
         description="Converts Obsidian notes to markdown export"
     )
     parser.add_argument(
-        "--config", type=str, help="The config file", default="config.yaml"
+        "command",
+        nargs="?",
+        choices=["build", "serve"],
+        default="build",
+        help="build once, or serve builds through a local http api",
     )
+    parser.add_argument(
+        "--config",
+        type=str,
+        nargs="+",
+        help="The config files",
+        default=["config.yaml"],
+    )
+    parser.add_argument(
+        "--rev",
+        type=str,
+        help="Build the sources at this git revision instead of the working tree",
+        default=None,
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Skip the notes done by the interrupted build, needs build.checkpoint",
+    )
+    parser.add_argument(
+        "--host", type=str, help="Address of the server", default="127.0.0.1"
+    )
+    parser.add_argument("--port", type=int, help="Port of the server", default=8765)
     args = parser.parse_args()
 
-    main(args.config)
+    if args.command == "serve":
+        from .serve import serve
+
+        serve(args.config, args.host, args.port)
+    elif len(args.config) == 1:
+        main(args.config[0], args.rev, args.resume)
+    else:
+        main_many(args.config, args.rev, args.resume)
@@ -0,0 +1,80 @@
+"""Reproducible tar and zip archives of the output."""
+
+import hashlib
+import io
+import os
+import tarfile
+import zipfile
+
+from obsidown import utils
+
+
+class Archive:
+    """Writes the files of the output in a `.tar` or `.zip` file.
+
+    The entries have no timestamps nor owners, so the same files added in the same
+    order give the same bytes. The tar is not compressed, the zip deflates the text
+    and stores the images as they are. The archive is written next to its path and
+    replaces it only when its contents changed, its sha256 is written in
+    `<path>.sha256` so a deploy can be skipped when it didn't change.
+    """
+
+    def __init__(self, path: str):
+        if not path.endswith((".tar", ".zip")):
+            raise ValueError(f"The archive must be a .tar or a .zip file: {path}")
+        self.path = path
+        self.names: set[str] = set()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._tmp_path = path + ".tmp"
+        if path.endswith(".zip"):
+            self._zip = zipfile.ZipFile(self._tmp_path, "w")
+            self._tar = None
+        else:
+            self._tar = tarfile.open(self._tmp_path, "w", format=tarfile.PAX_FORMAT)
+            self._zip = None
+
+    def add(self, name: str, data: bytes):
+        """Adds the file, every name can be added once."""
+        name = name.replace(os.sep, "/").lstrip("/")
+        if name in self.names:
+            raise ValueError(f"{name} is written twice in the archive")
+        self.names.add(name)
+
+        if self._zip is not None:
+            info = zipfile.ZipInfo(name, date_time=(1980, 1, 1, 0, 0, 0))
+            info.external_attr = 0o644 << 16
+            # The images are already compressed
+            info.compress_type = (
+                zipfile.ZIP_STORED if utils.is_image(name) else zipfile.ZIP_DEFLATED
+            )
+            self._zip.writestr(info, data)
+        else:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mode = 0o644
+            self._tar.addfile(info, io.BytesIO(data))
+
+    def close(self) -> str:
+        """Finishes the archive and returns its sha256."""
+        if self._zip is not None:
+            self._zip.close()
+        else:
+            self._tar.close()
+
+        with open(self._tmp_path, "rb") as f:
+            digest = hashlib.file_digest(f, "sha256").hexdigest()
+
+        digest_path = self.path + ".sha256"
+        previous = None
+        if os.path.exists(digest_path) and os.path.exists(self.path):
+            with open(digest_path, "r") as f:
+                previous = f.read().split()[0]
+        if previous == digest:
+            # Keep the old file and its modification time
+            os.remove(self._tmp_path)
+        else:
+            os.replace(self._tmp_path, self.path)
+            with open(digest_path, "w") as f:
+                f.write(f"{digest}  {os.path.basename(self.path)}\n")
+        return digest
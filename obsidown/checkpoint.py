@@ -0,0 +1,60 @@
+"""Journal of the notes done by a build, to resume it after an interruption."""
+
+import hashlib
+import json
+import os
+
+from obsidown.operations.base import MdFile
+
+
+class Checkpoint:
+    """Appends a line for every note that went through the whole pipeline.
+
+    A resumed build skips the notes of the journal whose loaded contents didn't change
+    since. Without `resume` the journal is started again from scratch. The journal is
+    removed at the end of a build without failures, otherwise it is kept so the next
+    run with `--resume` retries only the failed notes.
+    """
+
+    def __init__(self, path: str, resume: bool = False):
+        self.path = path
+        self.done: dict[str, str] = {}  # filename -> digest of the loaded note
+        if resume and os.path.exists(path):
+            with open(path, "r") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:  # the run stopped while writing
+                        continue
+                    self.done[entry["file"]] = entry["digest"]
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(path, "a" if resume else "w")
+
+    def is_done(self, md_file: MdFile, dependencies: list[MdFile] = []) -> bool:
+        return self.done.get(md_file.filename) == _digest(md_file, dependencies)
+
+    def record(self, md_file: MdFile, dependencies: list[MdFile] = []):
+        """Marks the loaded note as done, flushed at once to survive a crash.
+
+        The note is done again when it or one of its `dependencies` changes."""
+        entry = {"file": md_file.filename, "digest": _digest(md_file, dependencies)}
+        self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    def clear(self):
+        """Removes the journal, once the build is finished without failures."""
+        self._file.close()
+        os.remove(self.path)
+
+
+def _digest(md_file: MdFile, dependencies: list[MdFile]) -> str:
+    digest = hashlib.sha1(md_file.model_dump_json().encode())
+    for dependency in dependencies:
+        digest.update(dependency.model_dump_json().encode())
+    return digest.hexdigest()
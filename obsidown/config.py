@@ -6,6 +6,7 @@ from pydantic import BaseModel
 class SourcesList(BaseModel):
     paths: list[str]
     images: list[str]
+    rev: str | None = None  # read the sources from this git revision, not the files
 
 
 class Destination(BaseModel):
@@ -14,6 +15,37 @@ class Destination(BaseModel):
     images: str  # where to store the images
     images_path: str  # where to store the images in the filesystem
     filesystem: str  # the location of the processed files
+    archive: str | None = None  # .tar or .zip file written instead of the filesystem
+    manifest: str | None = None  # json file listing the files changed by the build
+
+
+class ImageExport(BaseModel):
+    dedup: bool = False  # store every image once, named by the hash of its contents
+    hash_cache: str | None = None  # json file with the hashes of the previous runs
+    responsive: bool = False  # resized copies of the images with a width, needs pillow
+    webp: bool = True  # add a webp version of the resized copies
+    derivatives_cache: str = (
+        ".obsidown/derivatives"  # where the resized copies are kept
+    )
+    workers: int | None = None  # processes resizing the images, default cpu count
+
+
+class BuildOptions(BaseModel):
+    prefetch: int = 0  # notes read ahead while the pipeline runs, 0 to read in order
+    readers: int = 4  # threads reading the notes ahead
+    writers: int = 0  # threads writing the output in background, 0 writes in place
+    write_queue: int = 64  # files waiting for the writers at most
+    skip_unchanged: bool = False  # don't rewrite the files already holding the output
+    resilient: bool = False  # record the notes that fail and go on with the others
+    checkpoint: str | None = None  # journal of the notes done, for --resume
+    metadata_store: str | None = (
+        None  # sqlite file keeping the parsed notes between runs
+    )
+    streaming: bool = (
+        False  # release every note after the pipeline, keep only the indexes
+    )
+    trace_memory: bool = False  # memory allocated by every stage and peak rss, slower
+    state: str = ".obsidown/state"  # where the operations keep what they need next run
 
 
 class Operation(BaseModel):
@@ -25,3 +57,5 @@ class Config(BaseModel):
     sources: SourcesList
     output: Destination
     pipeline: list[Operation]
+    image_export: ImageExport = ImageExport()
+    build: BuildOptions = BuildOptions()
@@ -0,0 +1,150 @@
+"""Reading of the sources from a git revision, without a checkout."""
+
+import datetime
+import os
+import subprocess
+import threading
+
+from obsidown import utils
+from obsidown.config import SourcesList
+
+
+class GitRevision:
+    """The files of a commit, read from the git object database.
+
+    The files keep the absolute paths they would have in a checkout of the repository,
+    so the rest of the build doesn't know where they come from. All the reads go to one
+    long lived `git cat-file --batch` process, and the time of the last commit of every
+    file comes from a single walk of the history.
+    """
+
+    def __init__(self, path: str, rev: str):
+        self.rev = rev
+        self.root = repository_root(path)
+        self.commit = self._git(self.root, "rev-parse", f"{rev}^{{commit}}").strip()
+        self.blobs = self._tree()
+        self.time: datetime.datetime | None = None  # of the commit, set by _history
+        self.commit_times = self._history()
+
+        self._process: subprocess.Popen | None = None
+        self._lock = threading.Lock()
+
+    def list(self, path: str) -> list[str]:
+        """The files under the directory, as absolute paths."""
+        prefix = self._relative(path).rstrip("/")
+        prefix = prefix + "/" if prefix else ""
+        return [
+            os.path.join(self.root, name)
+            for name in self.blobs
+            if name.startswith(prefix)
+        ]
+
+    def signature(self, path: str) -> str:
+        """The id of the blob, changes only when the contents change."""
+        return self.blobs[self._relative(path)]
+
+    def commit_time(self, path: str) -> datetime.datetime | None:
+        return self.commit_times.get(self._relative(path))
+
+    def read(self, path: str) -> bytes:
+        """Reads the contents of the file from the object database."""
+        blob = self.signature(path)
+        with self._lock:
+            if self._process is None:
+                self._process = subprocess.Popen(
+                    ["git", "cat-file", "--batch"],
+                    cwd=self.root,
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE,
+                )
+            self._process.stdin.write(blob.encode() + b"\n")
+            self._process.stdin.flush()
+
+            header = self._process.stdout.readline().decode().split()
+            if len(header) != 3:
+                raise FileNotFoundError(f"{path} not found in {self.commit}")
+            data = self._process.stdout.read(int(header[2]))
+            self._process.stdout.read(1)  # the newline after the contents
+        return data
+
+    def close(self):
+        if self._process is not None:
+            self._process.stdin.close()
+            self._process.wait()
+            self._process = None
+
+    def _relative(self, path: str) -> str:
+        relative = os.path.relpath(os.path.abspath(path), self.root)
+        if relative == ".":
+            return ""
+        if relative.startswith(".."):
+            raise ValueError(f"{path} is not in the repository {self.root}")
+        return relative
+
+    def _tree(self) -> dict[str, str]:
+        """The blob of every file in the commit."""
+        blobs = {}
+        output = self._git(self.root, "ls-tree", "-r", "-z", self.commit)
+        for entry in output.split("\0"):
+            if not entry:
+                continue
+            info, name = entry.split("\t", 1)
+            _, kind, blob = info.split()
+            if kind == "blob":
+                blobs[name] = blob
+        return blobs
+
+    def _history(self) -> dict[str, datetime.datetime]:
+        """The time of the last commit touching every file, from one history walk."""
+        times = {}
+        output = self._git(
+            self.root,
+            "-c",
+            "core.quotepath=off",
+            "log",
+            "--format=%x01%cd",
+            "--date=default",
+            "--name-only",
+            self.commit,
+        )
+        commit_time = None
+        for line in output.splitlines():
+            if line.startswith("\x01"):
+                commit_time = utils.parse_datetime(line[1:])
+                if self.time is None:
+                    self.time = commit_time
+            elif line and line not in times:
+                times[line] = commit_time
+        return times
+
+    @staticmethod
+    def _git(cwd: str, *args: str) -> str:
+        return subprocess.run(
+            ["git", *args], cwd=cwd, check=True, capture_output=True, text=True
+        ).stdout
+
+
+def repository_root(path: str) -> str:
+    """The working tree of the git repository containing the path."""
+    # The directory may not exist in the working tree, search an existing parent
+    directory = os.path.abspath(path)
+    while not os.path.isdir(directory):
+        directory = os.path.dirname(directory)
+    try:
+        return GitRevision._git(directory, "rev-parse", "--show-toplevel").strip()
+    except subprocess.CalledProcessError:
+        raise ValueError(f"{path} is not in a git repository") from None
+
+
+def open_source(sources: SourcesList) -> GitRevision | None:
+    """The git revision to read the sources from, None to read the filesystem.
+
+    All the notes and the images must be in the same repository."""
+    if sources.rev is None:
+        return None
+    roots = {path: repository_root(path) for path in [*sources.paths, *sources.images]}
+    if len(set(roots.values())) > 1:
+        raise ValueError(
+            f"The sources read at {sources.rev} must be in one git repository: {roots}"
+        )
+    return GitRevision(sources.paths[0], sources.rev)
@@ -0,0 +1,91 @@
+"""Graph of the wiki links between the notes of the vault."""
+
+from array import array
+from typing import Iterable, Iterator
+
+
+class LinkGraph:
+    """Directed graph of the links between the notes.
+
+    Every note gets a compact integer id. The edges are appended to two flat arrays
+    while the files are loaded and are compressed to CSR form (an offsets array and a
+    targets array, for both directions) the first time the graph is queried.
+    """
+
+    def __init__(self, names: Iterable[str] = ()):
+        self.names: list[str] = []
+        self.ids: dict[str, int] = {}
+        self._sources = array("l")
+        self._targets = array("l")
+        self._forward: tuple[array, array] | None = None
+        self._backward: tuple[array, array] | None = None
+
+        for name in names:
+            self.add_node(name)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def add_node(self, name: str) -> int:
+        """Returns the id of the node, creating it if it is not present."""
+        node = self.ids.get(name)
+        if node is None:
+            node = len(self.names)
+            self.ids[name] = node
+            self.names.append(name)
+            self._forward = self._backward = None
+        return node
+
+    def id(self, name: str) -> int | None:
+        """Returns the id of the node, None if the note is not in the graph."""
+        return self.ids.get(name)
+
+    def add_edge(self, source: int, target: int):
+        """Adds a link from the source note to the target note."""
+        self._sources.append(source)
+        self._targets.append(target)
+        self._forward = self._backward = None
+
+    def links(self, node: int) -> array:
+        """Ids of the notes linked by the node, sorted and without duplicates."""
+        if self._forward is None:
+            self._forward = self._compress(self._sources, self._targets)
+        offsets, targets = self._forward
+        return targets[offsets[node] : offsets[node + 1]]
+
+    def backlinks(self, node: int) -> array:
+        """Ids of the notes linking to the node, sorted and without duplicates."""
+        if self._backward is None:
+            self._backward = self._compress(self._targets, self._sources)
+        offsets, targets = self._backward
+        return targets[offsets[node] : offsets[node + 1]]
+
+    def edges(self) -> Iterator[tuple[int, int]]:
+        """Iterates over the deduplicated edges, ordered by source and target."""
+        for source in range(len(self.names)):
+            for target in self.links(source):
+                yield source, target
+
+    def _compress(self, sources: array, targets: array) -> tuple[array, array]:
+        """Builds the CSR arrays of the edges with a counting sort on the sources."""
+        n = len(self.names)
+        counts = array("l", bytes(array("l").itemsize * (n + 1)))
+        for source in sources:
+            counts[source + 1] += 1
+        for i in range(n):
+            counts[i + 1] += counts[i]
+
+        position = array("l", counts)
+        ordered = array("l", bytes(array("l").itemsize * len(targets)))
+        for source, target in zip(sources, targets):
+            ordered[position[source]] = target
+            position[source] += 1
+
+        # Sort every row and drop the duplicated links
+        offsets = array("l", [0])
+        result = array("l")
+        for i in range(n):
+            result.extend(sorted(set(ordered[counts[i] : counts[i + 1]])))
+            offsets.append(len(result))
+
+        return offsets, result
@@ -0,0 +1,155 @@
+"""Storage of the exported images: deduplication and resized copies."""
+
+import hashlib
+import io
+import json
+import os
+
+from obsidown.git_source import GitRevision
+from obsidown.output import Output
+
+try:
+    from PIL import Image
+except ImportError:  # optional, needed only for the responsive images
+    Image = None
+
+FORMATS = {".jpg": "JPEG", ".jpeg": "JPEG", ".png": "PNG", ".webp": "WEBP"}
+
+
+class ImageStore:
+    """Names every image after the hash of its contents, so copies are stored once.
+
+    The hashes are cached by path, keyed by size and modification time (by the blob
+    when the images are read from a git revision), and can be persisted between runs
+    in the `hash_cache` json file.
+    """
+
+    def __init__(
+        self,
+        images: list[str],
+        hash_cache: str | None = None,
+        source: GitRevision | None = None,
+    ):
+        self.images = images
+        self.hash_cache = hash_cache
+        self.source = source
+        self.hashes: dict[
+            str, list
+        ] = {}  # path -> [size, mtime, digest] or [blob, digest]
+        if hash_cache is not None and os.path.exists(hash_cache):
+            with open(hash_cache, "r") as f:
+                self.hashes = json.load(f)
+
+        self._names: dict[str, str | None] = {}
+
+    def local_path(self, image: str) -> str | None:
+        """Finds the image referenced in the notes in the sources."""
+        for img in self.images:
+            if image in img:
+                return img
+        return None
+
+    def read(self, path: str) -> bytes:
+        if self.source is not None:
+            return self.source.read(path)
+        with open(path, "rb") as f:
+            return f.read()
+
+    def digest(self, path: str) -> str:
+        """Hashes the contents of the file, reading it in chunks."""
+        if self.source is not None:
+            signature = [self.source.signature(path)]
+        else:
+            stat = os.stat(path)
+            signature = [stat.st_size, stat.st_mtime_ns]
+        cached = self.hashes.get(path)
+        if cached is not None and cached[:-1] == signature:
+            return cached[-1]
+
+        if self.source is not None:
+            digest = hashlib.sha256(self.source.read(path)).hexdigest()
+        else:
+            with open(path, "rb") as f:
+                digest = hashlib.file_digest(f, "sha256").hexdigest()
+        self.hashes[path] = signature + [digest]
+        return digest
+
+    def export(self, output: Output, path: str, local_path: str):
+        """Copies the image in the path, relative to the output directory."""
+        if self.source is not None:
+            output.write(path, self.source.read(local_path))
+        else:
+            output.copy(path, local_path)
+
+    def canonical_name(self, image: str) -> str | None:
+        """The name of the stored copy of the image, None if it is not in the sources."""
+        if image not in self._names:
+            local_path = self.local_path(image)
+            if local_path is None:
+                self._names[image] = None
+            else:
+                extension = os.path.splitext(image)[1].lower()
+                self._names[image] = self.digest(local_path)[:16] + extension
+        return self._names[image]
+
+    def save_cache(self):
+        if self.hash_cache is None:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.hash_cache)), exist_ok=True)
+        with open(self.hash_cache, "w") as f:
+            json.dump(self.hashes, f)
+
+
+def derivative_name(name: str, width: int, extension: str | None = None) -> str:
+    """The name of the copy of the image resized to the width.
+
+    Example
+    -------
+    >>> derivative_name("dir/pic.png", 300, ".webp")
+    "dir/pic-300w.webp"
+    """
+    root, original_extension = os.path.splitext(name)
+    return f"{root}-{width}w{extension or original_extension}"
+
+
+def cached_derivatives(
+    source: str, digest: str, width: int, cache_dir: str, webp: bool
+) -> list[str]:
+    """The paths of the resized copies in the cache, named after the hash of the
+    source and the width, so they are regenerated only when the source changes."""
+    extension = os.path.splitext(source)[1].lower()
+    targets = [os.path.join(cache_dir, f"{digest}-{width}w{extension}")]
+    if webp:
+        targets.append(os.path.join(cache_dir, f"{digest}-{width}w.webp"))
+    return targets
+
+
+def make_derivatives(
+    source: str,
+    digest: str,
+    width: int,
+    cache_dir: str,
+    webp: bool,
+    data: bytes | None = None,
+) -> list[str]:
+    """Resizes the image to the width and saves it in the cache, never upscaling.
+    Runs in the worker processes. The contents are in `data` when the source is not
+    on the filesystem."""
+    targets = cached_derivatives(source, digest, width, cache_dir, webp)
+    missing = [target for target in targets if not os.path.exists(target)]
+    if len(missing) == 0:
+        return targets
+
+    with Image.open(source if data is None else io.BytesIO(data)) as image:
+        if image.width > width:
+            height = round(image.height * width / image.width)
+            image = image.resize((width, height), Image.LANCZOS)
+        for target in missing:
+            image_format = FORMATS[os.path.splitext(target)[1]]
+            if image_format == "JPEG" and image.mode not in ("RGB", "L"):
+                image = image.convert("RGB")
+            # write and rename, an interrupted run should not leave broken files
+            image.save(target + ".tmp", format=image_format)
+            os.replace(target + ".tmp", target)
+
+    return targets
@@ -0,0 +1,146 @@
+"""Checking of the external links, with a cache of the results kept between runs."""
+
+import asyncio
+import json
+import os
+import ssl
+import time
+from urllib.parse import urljoin, urlsplit
+
+REDIRECTS = (301, 302, 303, 307, 308)
+
+
+class LinkChecker:
+    """Checks the urls with an asyncio client, at most `concurrency` requests at once
+    and one request every `delay` seconds to the same host.
+
+    The results are cached in the `cache` json file for `ttl` seconds. A result is
+    the status of the response, after the redirects, or None with the error when the
+    server could not be reached: the errors are often transient, they are cached for
+    `error_ttl` seconds only.
+    """
+
+    def __init__(
+        self,
+        cache: str | None = None,
+        ttl: float = 86400,
+        concurrency: int = 16,
+        delay: float = 0.5,
+        timeout: float = 10,
+        error_ttl: float = 3600,
+    ):
+        self.cache = cache
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self.concurrency = concurrency
+        self.delay = delay
+        self.timeout = timeout
+        self.results: dict[str, dict] = {}  # url -> {"status", "error", "checked"}
+        if cache is not None and os.path.exists(cache):
+            with open(cache, "r") as f:
+                self.results = json.load(f)
+        self.requests = 0  # the urls checked, not found in the cache
+
+    def check(self, urls: list[str]) -> dict[str, dict]:
+        """The results of the urls, checking only the ones missing from the cache."""
+        now = time.time()
+        missing = sorted(url for url in set(urls) if not self._fresh(url, now))
+        if missing:
+            asyncio.run(self._check_all(missing))
+        # The rate limited urls have no result
+        return {url: self.results[url] for url in urls if url in self.results}
+
+    def _fresh(self, url: str, now: float) -> bool:
+        result = self.results.get(url)
+        if result is None:
+            return False
+        ttl = self.ttl if result["status"] is not None else self.error_ttl
+        return now - result["checked"] <= ttl
+
+    def save_cache(self):
+        if self.cache is None:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.cache)), exist_ok=True)
+        with open(self.cache, "w") as f:
+            json.dump(self.results, f, sort_keys=True)
+
+    async def _check_all(self, urls: list[str]):
+        semaphore = asyncio.Semaphore(self.concurrency)
+        hosts: dict[str, list] = {}  # host -> [lock, time of the last request]
+
+        async def check(url: str):
+            host = urlsplit(url).hostname or ""
+            lock_and_time = hosts.setdefault(host, [asyncio.Lock(), 0.0])
+            # The requests to the same host are spaced by the delay, the tasks wait
+            # for their host without holding a slot the other hosts could use
+            async with lock_and_time[0]:
+                wait = lock_and_time[1] + self.delay - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                await semaphore.acquire()
+                lock_and_time[1] = time.monotonic()
+            try:
+                self.requests += 1
+                try:
+                    status, error = await self._request(url, "HEAD"), None
+                except (OSError, asyncio.TimeoutError, ValueError) as e:
+                    status, error = None, f"{type(e).__name__}: {e}"
+                if status != 429:  # rate limited, ask again next time
+                    self.results[url] = {
+                        "status": status,
+                        "error": error,
+                        "checked": time.time(),
+                    }
+            finally:
+                semaphore.release()
+
+        await asyncio.gather(*(check(url) for url in urls))
+
+    async def _request(self, url: str, method: str, redirects: int = 5) -> int:
+        """The status of the response, following the redirects."""
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError(f"Not an http url: {url}")
+        https = parts.scheme == "https"
+        port = parts.port or (443 if https else 80)
+
+        context = ssl.create_default_context() if https else None
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(parts.hostname, port, ssl=context), self.timeout
+        )
+        try:
+            target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+            host = parts.hostname + (f":{parts.port}" if parts.port else "")
+            writer.write(
+                f"{method} {target} HTTP/1.1\r\nHost: {host}\r\n"
+                "User-Agent: obsidown-linkcheck\r\nAccept: */*\r\n"
+                "Connection: close\r\n\r\n".encode()
+            )
+            await writer.drain()
+
+            status_line = await asyncio.wait_for(reader.readline(), self.timeout)
+            fields = status_line.split()
+            if len(fields) < 2 or not fields[1].isdigit():
+                raise ValueError(f"Bad response from {host}: {status_line!r}")
+            status = int(fields[1])
+            headers = {}
+            while True:
+                line = await asyncio.wait_for(reader.readline(), self.timeout)
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+
+        if status in REDIRECTS and "location" in headers and redirects > 0:
+            location = urljoin(url, headers["location"])
+            return await self._request(location, method, redirects - 1)
+        if method == "HEAD" and status in (405, 501):
+            # Some servers answer only to GET, only the headers are read
+            return await self._request(url, "GET", redirects)
+        return status
@@ -0,0 +1,209 @@
+"""Loading of the notes, reusing the files parsed by the previous builds."""
+
+import hashlib
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator
+
+from obsidown import utils
+from obsidown.git_source import GitRevision
+from obsidown.operations.base import (
+    MdFile,
+    _file_head,
+    _last_commit_time,
+    _repo_heads,
+)
+from obsidown.store import MetadataStore
+
+
+class NoteLoader:
+    """Loads the notes and keeps them between builds.
+
+    A file is parsed again only when its size or modification time changes. The git
+    metadata of all the files is reloaded when the checked out commit changes.
+    With a `source` the files are read from a git revision instead of the filesystem.
+    With a `store` the parsed notes are also kept between runs, only their commit
+    time is read again after a new commit. Without `keep` the
+    notes are not kept in memory, every build reads them again (or from the store).
+    The notes are read only up to the first of the `cut` strings, see `cut_markers`.
+    """
+
+    def __init__(
+        self,
+        source: GitRevision | None = None,
+        store: MetadataStore | None = None,
+        keep: bool = True,
+        cut: tuple[str, ...] = (),
+    ):
+        self.source = source
+        self.store = store
+        self.keep = keep
+        self.cut = cut
+        # The notes cut at other strings are not reused from the store
+        self._cut_key = ""
+        if cut:
+            self._cut_key = ":" + hashlib.sha1("\0".join(cut).encode()).hexdigest()[:12]
+        self.notes: dict[str, tuple[tuple[int, int] | str, MdFile]] = {}
+        self.listings: dict[tuple[str, str], list[str]] = {}
+        self.heads: dict[str, str] = {}
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0  # the notes found in the store
+
+    def refresh(self):
+        """Called at the start of every build, drops the stale git metadata."""
+        heads = _repo_heads()
+        if heads != self.heads:
+            self.notes.clear()
+            self.heads = heads
+        self.listings.clear()
+        self.hits = self.misses = self.stored = 0
+
+    def list_files(self, path: str) -> list[str]:
+        """The files in the directory, walked once per build."""
+        if ("files", path) not in self.listings:
+            self.listings["files", path] = load_files(path, self.source)
+            if self.store is not None:
+                self.store.retain(path, self.listings["files", path])
+        return self.listings["files", path]
+
+    def list_images(self, path: str) -> list[str]:
+        """The images in the directory, walked once per build."""
+        if ("images", path) not in self.listings:
+            self.listings["images", path] = load_images(path, self.source)
+        return self.listings["images", path]
+
+    def load(self, filename: str) -> MdFile:
+        if self.source is not None:
+            signature = self.source.signature(filename)
+        else:
+            stat = os.stat(filename)
+            signature = (stat.st_mtime_ns, stat.st_size)
+        cached = self.notes.get(filename)
+        if cached is not None and cached[0] == signature:
+            self.hits += 1
+            return cached[1]
+
+        if self.store is None:
+            self.misses += 1
+            md_file = MdFile.from_filename(filename, self.source, self.cut)
+        else:
+            if self.source is not None:
+                key, head = signature, self.source.commit
+            else:
+                key, head = f"{signature[0]}:{signature[1]}", _file_head(filename)
+            key += self._cut_key
+            stored = self.store.get(filename, key)
+            if stored is not None:
+                self.stored += 1
+                md_file, stored_head = stored
+                if stored_head != head:
+                    # The file didn't change, only its last commit can have
+                    metadata = dict(md_file.metadata)
+                    metadata["last_commit_time"] = _last_commit_time(
+                        filename, self.source
+                    )
+                    md_file = MdFile(
+                        metadata=metadata,
+                        contents=md_file.contents,
+                        references=md_file.references,
+                        filename=filename,
+                        protected=md_file.protected,
+                    )
+                    self.store.put(md_file, key, head)
+            else:
+                self.misses += 1
+                md_file = MdFile.from_filename(filename, self.source, self.cut)
+                self.store.put(md_file, key, head)
+        if self.keep:
+            self.notes[filename] = (signature, md_file)
+        return md_file
+
+    def load_many(
+        self,
+        filenames: list[str],
+        prefetch: int = 0,
+        readers: int = 4,
+        on_error: Callable[[str, Exception], None] | None = None,
+    ) -> Iterator[MdFile]:
+        """Loads the files in order, reading up to `prefetch` files ahead in a thread
+        pool while the caller works on the current one.
+
+        With `on_error` the files that can't be read or parsed are passed to it with
+        the error and skipped, instead of raising it."""
+        if prefetch <= 0:
+            for filename in filenames:
+                try:
+                    md_file = self.load(filename)
+                except Exception as e:
+                    if on_error is None:
+                        raise
+                    on_error(filename, e)
+                    continue
+                yield md_file
+            return
+
+        with ThreadPoolExecutor(max_workers=readers) as executor:
+            pending = deque()
+            filenames = iter(filenames)
+            for filename in filenames:
+                pending.append((filename, executor.submit(self.load, filename)))
+                if len(pending) >= prefetch:
+                    break
+
+            while pending:
+                filename, future = pending.popleft()
+                next_filename = next(filenames, None)
+                if next_filename is not None:
+                    future_next = executor.submit(self.load, next_filename)
+                    pending.append((next_filename, future_next))
+                try:
+                    md_file = future.result()
+                except Exception as e:
+                    if on_error is None:
+                        raise
+                    on_error(filename, e)
+                    continue
+                yield md_file
+
+    def flush(self):
+        """Commits the notes parsed by the build to the store."""
+        if self.store is not None:
+            self.store.commit()
+
+    def close(self):
+        if self.source is not None:
+            self.source.close()
+        if self.store is not None:
+            self.store.close()
+
+
+def load_images(filepath: str, source: GitRevision | None = None) -> list[str]:
+    """Returns a list of all files in the directory."""
+    if source is not None:
+        return [file for file in source.list(filepath) if utils.is_image(file)]
+
+    result = []
+    for root, dirs, files in os.walk(filepath):
+        for file in files:
+            if utils.is_image(file):
+                result.append(os.path.join(root, file))
+
+    # The walk order depends on the filesystem, the output should not
+    return sorted(result)
+
+
+def load_files(filepath: str, source: GitRevision | None = None) -> list[str]:
+    """Returns a list of all files in the directory."""
+    if source is not None:
+        return [file for file in source.list(filepath) if not utils.is_image(file)]
+
+    result = []
+    for root, dirs, files in os.walk(filepath):
+        for file in files:
+            if not utils.is_image(file):
+                result.append(os.path.join(root, file))
+
+    # The walk order depends on the filesystem, the output should not
+    return sorted(result)
@@ -1,63 +1,336 @@
 from typing import Iterable
 import yaml
 import os
+import time
+import tracemalloc
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
 
+from obsidown.checkpoint import Checkpoint
 from obsidown.config import Config
-from obsidown.operations.base import MdFile, _load_contents
+from obsidown.git_source import open_source
+from obsidown.images import (
+    Image,
+    ImageStore,
+    cached_derivatives,
+    derivative_name,
+    make_derivatives,
+)
+from obsidown.loader import NoteLoader
 from obsidown.operations.dispatch import dispatch
+from obsidown.operations.remove_after_string import cut_markers
+from obsidown.output import Output
+from obsidown.report import Report, peak_rss
+from obsidown.routes import RouteTable
+from obsidown.store import MetadataStore
+from obsidown.vault import Vault
 from . import utils
 
 
-def main(config: str):
+def main(config: str, rev: str | None = None, resume: bool = False):
     """List of paths"""
 
     print("reading the config")
-    config = yaml.load(open(config, "r"), Loader=yaml.FullLoader)
-    config: Config = Config(**config)
-
-    print("Loading images")
-    images = []
-    for images_path in config.sources.images:
-        images += load_images(images_path)
-
-    print("Loading files")
-    files = []
-    for path in config.sources.paths:
-        files += load_files(path)
-    print(f"reading {len(files)} files")
-
-    image_refs = set()
-    for file in files:
-        md_file = MdFile.from_filename(file)
-
-        # We need to remove the references that will not be present in the final file
-        not_cited_refs = set()
-        for ref in md_file.references:
-            ref_split = ref.split("|")
-            ref = ref_split[0]  # don't want the aliases!
-            if utils.is_image(ref):
-                image_refs.add(ref)
-            else:
-                # here is image ref, we should count only the first part
-                ref = ref.split("#")[0]
-                found = False
-                for f in files:
-                    if ref in f:
-                        found = True
-                        break
-
-                if not found:
-                    not_cited_refs.add(ref)
-
-        for operation in config.pipeline:
-            operation = dispatch(
-                operation.name, config, not_cited_refs, **operation.options
+    report = build(load_config(config, rev), resume=resume)
+    report.print()
+
+
+def main_many(configs: list[str], rev: str | None = None, resume: bool = False):
+    """Builds several configs, loading the shared sources once."""
+    print("reading the configs")
+    reports = build_many([load_config(config, rev) for config in configs], resume=resume)
+    for config, report in zip(configs, reports):
+        print(config)
+        report.print()
+
+
+def load_config(path: str, rev: str | None = None) -> Config:
+    """Reads the config, the git revision of the sources can be overridden."""
+    with open(path, "r") as f:
+        config = Config(**yaml.load(f, Loader=yaml.FullLoader))
+    if rev is not None:
+        config.sources.rev = rev
+    return config
+
+
+def build_many(
+    configs: list[Config],
+    loader: NoteLoader | None = None,
+    workers: int | None = None,
+    resume: bool = False,
+) -> list[Report]:
+    """Builds several configs on the same sources.
+
+    The union of the sources is listed and parsed once, then the pipelines run in a
+    thread pool on the shared notes, which the operations never modify in place.
+    The first report has the timings of the shared load. All the configs must read
+    the same git revision of the sources. When a config streams, the notes are not
+    kept: every build reads them itself, from the metadata store if any.
+    """
+    revs = {config.sources.rev for config in configs}
+    if len(revs) > 1:
+        raise ValueError(f"The configs read different revisions: {sorted(map(str, revs))}")
+
+    # Traced once for all the builds, the threads share the tracing
+    trace_memory = any(config.build.trace_memory for config in configs)
+    if not trace_memory or tracemalloc.is_tracing():
+        return _build_many(configs, loader, workers, resume)
+    tracemalloc.start()
+    try:
+        return _build_many(configs, loader, workers, resume)
+    finally:
+        tracemalloc.stop()
+
+
+def _build_many(
+    configs: list[Config], loader: NoteLoader | None, workers: int | None, resume: bool
+) -> list[Report]:
+    owns_loader = loader is None
+    if loader is None:
+        # The notes are cut only where all the pipelines cut them
+        markers = [set(cut_markers(config)) for config in configs[1:]]
+        cut = tuple(
+            marker
+            for marker in cut_markers(configs[0])
+            if all(marker in others for others in markers)
+        )
+        keep = not any(config.build.streaming for config in configs)
+        loader = open_loader(configs[0], keep=keep, cut=cut)
+    loader.refresh()
+
+    shared = Report(any(config.build.trace_memory for config in configs))
+    with shared.stage("shared load"):
+        for config in configs:
+            for images_path in config.sources.images:
+                loader.list_images(images_path)
+            files = []
+            for path in config.sources.paths:
+                files += loader.list_files(path)
+            if not loader.keep:  # only listed, the builds read the notes
+                continue
+            # The notes failing to load fail again in the builds, which report them
+            notes = loader.load_many(
+                files,
+                config.build.prefetch,
+                config.build.readers,
+                on_error=lambda filename, error: None,
             )
-            md_file = operation(md_file)
-    
+            for _ in notes:
+                pass
+    loader.flush()
+    shared.count("notes parsed", loader.misses)
+    if loader.store is not None:
+        shared.count("notes from the store", loader.stored)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(build, config, loader, refresh=False, resume=resume)
+            for config in configs
+        ]
+        reports = [future.result() for future in futures]
+    if owns_loader:
+        loader.close()
+
+    for report in reports:
+        report.stages = {**shared.stages, **report.stages}
+        report.counters = {**shared.counters, **report.counters}
+        report.memory = {**shared.memory, **report.memory}
+    return reports
+
+
+def open_loader(
+    config: Config, keep: bool = True, cut: tuple[str, ...] | None = None
+) -> NoteLoader:
+    """The loader of the sources of the config, with its metadata store if any.
+    The notes are cut at the `cut_markers` of the config, unless `cut` is given."""
+    store = None
+    if config.build.metadata_store is not None:
+        store = MetadataStore(config.build.metadata_store)
+    if cut is None:
+        cut = cut_markers(config)
+    return NoteLoader(open_source(config.sources), store, keep, cut)
+
+
+def build(
+    config: Config,
+    loader: NoteLoader | None = None,
+    refresh: bool = True,
+    resume: bool = False,
+) -> Report:
+    """Runs the pipeline of the config on the sources.
+    The loader can be kept between builds, to parse again only the changed files.
+    With `resume` the notes done by the interrupted build, in `build.checkpoint`, are
+    skipped."""
+    if not config.build.trace_memory or tracemalloc.is_tracing():
+        return _build(config, loader, refresh, resume)
+    tracemalloc.start()
+    try:
+        return _build(config, loader, refresh, resume)
+    finally:
+        tracemalloc.stop()
+
+
+def _build(
+    config: Config, loader: NoteLoader | None, refresh: bool, resume: bool
+) -> Report:
+    report = Report(config.build.trace_memory)
+    streaming = config.build.streaming
+    owns_loader = loader is None
+    if loader is None:
+        # Streaming, the notes are read again by the next build
+        loader = open_loader(config, keep=not streaming)
+    if refresh:
+        loader.refresh()
+    loader_rev = loader.source.rev if loader.source is not None else None
+    if loader_rev != config.sources.rev:
+        raise ValueError(
+            f"The config reads the revision {config.sources.rev}, the loader {loader_rev}"
+        )
+    if streaming and loader.keep:
+        raise ValueError("build.streaming needs a loader not keeping the notes")
+    if not set(loader.cut) <= set(cut_markers(config)):
+        raise ValueError(
+            f"The loader cuts the notes at {loader.cut}, the pipeline doesn't remove"
+            " everything after them"
+        )
+
+    with report.stage("list"):
+        print("Loading images")
+        images = []
+        for images_path in config.sources.images:
+            images += loader.list_images(images_path)
+
+        print("Loading files")
+        files = []
+        for path in config.sources.paths:
+            files += loader.list_files(path)
+        print(f"reading {len(files)} files")
+
+    # Fails on the notes with the same output path before doing any work
+    routes = RouteTable(config.output, files)
+    image_store = ImageStore(images, config.image_export.hash_cache, loader.source)
+    vault = Vault(files, images, image_store, routes, keep_notes=not streaming)
+    output = Output(
+        config.output.filesystem,
+        config.build.writers,
+        config.build.write_queue,
+        config.build.skip_unchanged,
+        config.output.archive,
+        config.output.manifest,
+    )
+    with report.stage("setup"):
+        pipeline = [
+            dispatch(operation.name, config, vault, output, **operation.options)
+            for operation in config.pipeline
+        ]
+        for operation in pipeline:
+            operation.setup(pipeline)
+    names = [f"{i}:{operation.name}" for i, operation in enumerate(config.pipeline)]
+    if streaming:
+        for name, operation in zip(names, pipeline):
+            if operation.needs_vault:
+                raise ValueError(
+                    f"{name} needs the whole vault, it can't run with build.streaming"
+                )
+
+    # The notes that can't be parsed are recorded and skipped like the failed ones
+    def load_error(filename: str, error: Exception):
+        report.error(filename, "load", error)
+
+    # The next notes are read while the current ones go through the pipeline
+    notes = loader.load_many(
+        files,
+        config.build.prefetch,
+        config.build.readers,
+        load_error if config.build.resilient else None,
+    )
+    # A loader shared with other configs cuts the notes only at the strings common to
+    # all of them, the vault indexes only what the pipeline keeps of the notes
+    cut = tuple(string for string in cut_markers(config) if string not in loader.cut)
+    if cut:
+        notes = (md_file.cut(cut) for md_file in notes)
+    notes = report.timed("load", vault.register(notes))
+    if any(operation.needs_vault for operation in pipeline):
+        # Load all the files first, the backlinks need the references of the whole vault
+        notes = list(notes)
+
+    checkpoint = None
+    if config.build.checkpoint is not None:
+        checkpoint = Checkpoint(config.build.checkpoint, resume)
+    elif resume:
+        raise ValueError("Resuming needs build.checkpoint in the config")
+
+    embeds = any(operation.embeds_notes for operation in pipeline)
+    try:
+        with report.measure("notes"):
+            for md_file in notes:
+                # A note is processed again when one of the notes it embeds changed
+                dependencies = vault.embedded(md_file) if embeds else []
+                if checkpoint is not None and checkpoint.is_done(md_file, dependencies):
+                    for operation in pipeline:
+                        operation.resumed(md_file)
+                    report.count("notes resumed")
+                    continue
+
+                loaded = md_file
+                try:
+                    for name, operation in zip(names, pipeline):
+                        if not operation.applies(md_file):
+                            report.skip(name)
+                            continue
+                        start = time.perf_counter()
+                        md_file = operation(md_file)
+                        report.add(name, time.perf_counter() - start)
+                except Exception as e:
+                    if not config.build.resilient:
+                        raise
+                    report.error(loaded.filename, name, e)
+                    continue
+                if checkpoint is not None:
+                    checkpoint.record(loaded, dependencies)
+    finally:
+        if checkpoint is not None:
+            checkpoint.close()
+    if refresh:
+        loader.flush()
+        report.count("notes parsed", loader.misses)
+        if loader.store is not None:
+            report.count("notes from the store", loader.stored)
+
+    with report.stage("finalize"):
+        for operation in pipeline:
+            operation.finalize()
+    for name, operation in zip(names, pipeline):
+        for counter, value in operation.counts().items():
+            report.count(f"{name} {counter}", value)
 
     # Now write the images on the filesystem
-    save_images(image_refs, images, config)
+    with report.stage("images"):
+        if config.image_export.dedup:
+            save_unique_images(vault.image_refs, image_store, config, output)
+        else:
+            save_images(vault.image_refs, image_store, config, output)
+        if config.image_export.responsive:
+            save_responsive_images(vault.image_widths, image_store, config, output)
+        image_store.save_cache()
+
+    with report.stage("flush"):
+        # The files of the failed notes are kept until they build again
+        output.close(prune=not report.errors)
+    if output.digest is not None:
+        print(f"Archive {config.output.archive} sha256 {output.digest}")
+    if output.manifest is not None:
+        print(f"Manifest {output.manifest}: {len(output.changes)} files changed")
+    # Kept after failed notes, for the next --resume
+    if checkpoint is not None and not report.errors:
+        checkpoint.clear()
+    if output.skip_unchanged:
+        report.count("files unchanged", output.unchanged)
+    if owns_loader:
+        loader.close()
+    if config.build.trace_memory:
+        report.peak_rss = peak_rss()
+
+    return report
 
     # Don't know if index page is needed
     # Now create index pages
@@ -79,50 +352,131 @@ def main(config: str):
 # \n
 # """
 #     index_content += "Here you can find the categories of all the notes on the site: \n"
-# index_content += create_table_contents(files, config)
+# index_content += create_table_contents(files, routes)
 # with open(
 #     os.path.join(config.output.filesystem, config.output.path, "index.md"), "w"
 # ) as f:
 #     f.write(frontmatter.dumps(frontmatter.Post(index_content, **index_frontmatter)))
 
 
-def save_images(image_refs: Iterable[str], images: list[str], config: Config):
+def save_images(
+    image_refs: Iterable[str], store: ImageStore, config: Config, output: Output
+):
     """Saves the images in the correct directory."""
     print("Saving images...", len(image_refs), "images found.")
-    for image in image_refs:
-        image_local_path = None
-        for img in images:
-            if image in img:
-                image_local_path = img
-                break
+    for image in sorted(image_refs):  # the order of the entries of an archive
+        image_local_path = store.local_path(image)
         if image_local_path is None:
             print(f"Image {image} not found in the filesystem")
             continue
 
         # This is to make sure we don't get any overlapping images!
         # Another solution is to change the name of the image...
-        dirname = os.path.dirname(image)
-        output_dir = os.path.join(
-            config.output.filesystem, config.output.images_path, dirname
+        store.export(
+            output, os.path.join(config.output.images_path, image), image_local_path
         )
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
 
-        with open(
-            os.path.join(config.output.filesystem, config.output.images_path, image),
-            "wb",
-        ) as f:
-            with open(image_local_path, "rb") as i:
-                f.write(i.read())
 
+def save_unique_images(
+    image_refs: Iterable[str], store: ImageStore, config: Config, output: Output
+):
+    """Saves every distinct image once, named after the hash of its contents."""
+    print("Saving images...", len(image_refs), "images found.")
 
-def create_table_contents(files: list[str], config: Config) -> str:
+    saved = set()
+    for image in sorted(image_refs):  # the order of the entries of an archive
+        name = store.canonical_name(image)
+        if name is None:
+            print(f"Image {image} not found in the filesystem")
+            continue
+        if name in saved:
+            continue
+        saved.add(name)
+
+        # The name depends only on the contents, an existing file is already right
+        output_path = os.path.join(config.output.images_path, name)
+        if output.exists(output_path):
+            output.keep(output_path)
+            continue
+        store.export(output, output_path, store.local_path(image))
+
+    print(f"Stored {len(saved)} distinct images.")
+
+
+def save_responsive_images(
+    image_widths: dict[str, set[int]],
+    store: ImageStore,
+    config: Config,
+    output: Output,
+):
+    """Saves the resized copies of the images for the widths used in the notes.
+
+    The copies are generated in a process pool and cached by the hash of the source,
+    only the missing ones are generated.
+    """
+    if Image is None:
+        raise ValueError("Responsive images need pillow: pip install pillow")
+
+    options = config.image_export
+    os.makedirs(options.derivatives_cache, exist_ok=True)
+
+    tasks = []  # (source, digest, width, name)
+    for image, widths in image_widths.items():
+        local_path = store.local_path(image)
+        if local_path is None:
+            continue
+        digest = store.digest(local_path)
+        name = store.canonical_name(image) if options.dedup else image
+        for width in sorted(widths):
+            tasks.append((local_path, digest, width, name))
+    print(f"Saving {len(tasks)} resized images...")
+
+    # Only the copies missing from the cache go to the process pool
+    results: list[list[str] | Future] = []
+    executor = None
+    for local_path, digest, width, _ in tasks:
+        arguments = (local_path, digest, width, options.derivatives_cache, options.webp)
+        derivatives = cached_derivatives(*arguments)
+        if all(os.path.exists(derivative) for derivative in derivatives):
+            results.append(derivatives)
+            continue
+        if executor is None:
+            executor = ProcessPoolExecutor(max_workers=options.workers)
+        # Without a checkout the workers get the contents instead of the path
+        data = store.read(local_path) if store.source is not None else None
+        results.append(executor.submit(make_derivatives, *arguments, data))
+
+    saved = set()  # the copies of identical images have the same name with dedup
+    try:
+        for (_, _, width, name), result in zip(tasks, results):
+            derivatives = result.result() if isinstance(result, Future) else result
+            for derivative in derivatives:
+                extension = os.path.splitext(derivative)[1]
+                output_path = os.path.join(
+                    config.output.images_path, derivative_name(name, width, extension)
+                )
+                if output_path in saved:
+                    continue
+                saved.add(output_path)
+                # Copy only when the cached file is newer than the exported one
+                end_path = output.path(output_path)
+                if output.exists(output_path) and os.path.getmtime(
+                    end_path
+                ) >= os.path.getmtime(derivative):
+                    output.keep(output_path)
+                    continue
+                output.copy(output_path, derivative)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+
+def create_table_contents(files: list[str], routes: RouteTable) -> str:
     """Creates the table of contents for the index page."""
     categories = {}
     for file in files:
-        _, contents, references = _load_contents(file)
         no_extension = utils.remove_extension(os.path.basename(file))
-        target = "/" + utils.to_kebab_case(config.output.path + "/" + no_extension)
+        target = routes.route(file).url
 
         # The name of the directory is the category
         current_category = (
@@ -147,27 +501,5 @@ def create_table_contents(files: list[str], config: Config) -> str:
     return index_content
 
 
-def load_images(filepath: str) -> list[str]:
-    """Returns a list of all files in the directory."""
-    result = []
-    for root, dirs, files in os.walk(filepath):
-        for file in files:
-            if utils.is_image(file):
-                result.append(os.path.join(root, file))
-
-    return result
-
-
-def load_files(filepath: str) -> list[str]:
-    """Returns a list of all files in the directory."""
-    result = []
-    for root, dirs, files in os.walk(filepath):
-        for file in files:
-            if not utils.is_image(file):
-                result.append(os.path.join(root, file))
-
-    return result
-
-
 if __name__ == "__main__":
     main()
@@ -1,29 +1,60 @@
 import frontmatter
+import hashlib
+import io
 import os
-from git import Repo
+from git import InvalidGitRepositoryError, NoSuchPathError, Repo
 from pydantic import BaseModel
 import datetime
+import threading
+from typing import TextIO
 
 from obsidown import utils
+from obsidown.config import Config
+from obsidown.git_source import GitRevision
 
 
 class MdFile(BaseModel):
     metadata: dict
-    contents: str
+    contents: str  # code blocks and inline code are replaced by placeholders
     references: list[str]
     filename: str
+    protected: list[str] = []  # the code replaced by the placeholders
 
     @classmethod
-    def from_filename(cls, filename: str):
-        metadata, contents, references = _load_contents(filename)
+    def from_filename(
+        cls, filename: str, source: GitRevision | None = None, cut: tuple[str, ...] = ()
+    ):
+        metadata, contents, references, protected = _load_contents(
+            filename, source, cut
+        )
         new_instance = cls(
             metadata=metadata,
             contents=contents,
             references=references,
             filename=filename,
+            protected=protected,
         )
         return new_instance
 
+    def cut(self, strings: tuple[str, ...]) -> "MdFile":
+        """The note up to the first of the strings outside of the code, as if it was
+        read with `cut`. The references after it are dropped too."""
+        cut = _cut(self.contents, self.protected, strings)
+        if cut is None:
+            return self
+        contents, protected = cut
+        return MdFile(
+            metadata=self.metadata,
+            contents=contents,
+            references=utils.extract_links(contents),
+            filename=self.filename,
+            protected=protected,
+        )
+
+    def text(self) -> str:
+        """The contents with the code put back in place of the placeholders."""
+        return utils.restore_code(self.contents, self.protected)
+
     def get_title(self) -> str:
         """Get the title of the markdown file."""
         return self.metadata["title"]
@@ -36,15 +67,58 @@ class MdFile(BaseModel):
 class MdOperations:
     """Operations that run on a single markdown file"""
 
+    # The operation needs every file of the vault loaded before the pipeline starts
+    needs_vault = False
+    # The operation copies the embedded notes in the file, so it changes with them
+    embeds_notes = False
+    # The operation keeps what it sees of the notes (counters, indexes, written files),
+    # so it must see every note once: it can't run on the notes embedded by `embed`
+    stateful = False
+
     def __init__(self, *args, **kwargs):
         pass
 
     def __call__(self, file: MdFile, *args, **kwargs) -> MdFile:
         pass
 
+    def setup(self, pipeline: list["MdOperations"]):
+        """Called once with the whole pipeline, before the first file."""
+        pass
+
+    def applies(self, file: MdFile) -> bool:
+        """Cheap check run before the operation, False when it can't change the file.
 
-def _load_contents(filepath: str) -> tuple[dict, str, list[str]]:
-    """Load the contents from the config file.
+        The pipeline then passes the file unchanged to the next operation."""
+        return True
+
+    def resumed(self, file: MdFile):
+        """Called instead of the operation for the notes done by the resumed build."""
+        pass
+
+    def finalize(self):
+        """Called once after all the files went through the pipeline."""
+        pass
+
+    def counts(self) -> dict[str, int]:
+        """Counters of the operation, added to the report at the end of the build."""
+        return {}
+
+
+def state_path(config: Config, name: str, path: str) -> str:
+    """The file in `build.state` where the operation keeps its state between runs,
+    one for every output and `path` of the operation in it."""
+    output = os.path.abspath(config.output.archive or config.output.filesystem)
+    key = hashlib.sha1(f"{output}\0{path}".encode()).hexdigest()[:12]
+    return os.path.join(config.build.state, f"{name}-{key}.json")
+
+
+def _load_contents(
+    filepath: str, source: GitRevision | None = None, cut: tuple[str, ...] = ()
+) -> tuple[dict, str, list[str], list[str]]:
+    """Load the contents from the config file, or from the git revision if given.
+
+    The contents are cut at the first of the `cut` strings found outside of the code,
+    like `remove_after_string` does, and the file is read only up to it.
 
     Returns
     -------
@@ -52,19 +126,145 @@ def _load_contents(filepath: str) -> tuple[dict, str, list[str]]:
         dict
             The metadata of the file
         list[str]
-            The contents of the file
+            The contents of the file, with the code replaced by placeholders
         Second dict
-            The references of the file
+            The references of the file, outside of the code
+        list[str]
+            The code replaced by the placeholders
     """
 
-    with open(filepath, "r") as file:
-        metadata, contents = frontmatter.parse(file.read())
+    if source is not None:
+        metadata, contents, protected = _parse(
+            io.StringIO(source.read(filepath).decode()), cut
+        )
+    else:
+        with open(filepath, "r") as file:
+            metadata, contents, protected = _parse(file, cut)
+
+    metadata["last_commit_time"] = _last_commit_time(filepath, source)
+    return metadata, contents, utils.extract_links(contents), protected
+
+
+def _last_commit_time(
+    filepath: str, source: GitRevision | None = None
+) -> datetime.datetime:
+    """The time of the last commit of the file, in the git revision if given."""
+    if source is not None:
+        return source.commit_time(filepath) or source.time
 
     try:
-        repo = Repo(os.path.dirname(filepath), search_parent_directories=True)
+        # Every thread reading the notes has its own repositories, the git log of
+        # the notes run in parallel
+        repo = _find_repo(os.path.dirname(filepath))
+        if repo is None:
+            raise ValueError(f"{filepath} is not in a git repository")
         commit = next(repo.iter_commits(paths=filepath, max_count=1))
-        metadata["last_commit_time"] = commit.committed_datetime
-    except Exception as e:
-        metadata["last_commit_time"] = datetime.datetime.now()
+        return commit.committed_datetime
+    except Exception:
+        # Not committed yet, the modification time is stable between runs. In utc,
+        # the same on every machine
+        mtime = os.stat(filepath).st_mtime
+        return datetime.datetime.fromtimestamp(mtime, datetime.timezone.utc)
+
+
+def _parse(file: TextIO, cut: tuple[str, ...]) -> tuple[dict, str, list[str]]:
+    """The metadata, the contents with the code protected and the code of the file,
+    read up to the first line with one of the `cut` strings outside of the code."""
+    if not cut:
+        metadata, contents = frontmatter.parse(file.read())
+        return metadata, *utils.protect_code(contents)
+
+    lines = []
+    for line in file:
+        lines.append(line)
+        # The strings spanning several lines are only found at the end of the file
+        if any(string in line for string in cut):
+            parsed = _parse_cut("".join(lines), cut)
+            if parsed is not None:
+                return parsed
+    return _parse_cut("".join(lines), cut, end=True)
+
+
+def _parse_cut(
+    text: str, cut: tuple[str, ...], end: bool = False
+) -> tuple[dict, str, list[str]] | None:
+    """Parses the beginning of a file, None when none of the strings is found outside
+    of the frontmatter and the code before the `end` of the file."""
+    if not end:
+        # A string in the frontmatter, not closed yet, is not in the contents
+        handler = frontmatter.detect_format(text.strip(), frontmatter.handlers)
+        if handler is not None:
+            try:
+                handler.split(text.strip())
+            except ValueError:
+                return None
+
+    metadata, contents = frontmatter.parse(text)
+    contents, protected = utils.protect_code(contents)
+    cut_contents = _cut(contents, protected, cut)
+    if cut_contents is not None:
+        return metadata, *cut_contents
+    if not end:
+        return None
+    return metadata, contents, protected
+
+
+def _cut(
+    contents: str, protected: list[str], cut: tuple[str, ...]
+) -> tuple[str, list[str]] | None:
+    """The contents with the code protected and the code, up to the first of the
+    `cut` strings outside of the code. None when none of them is found."""
+    found = [contents.index(string) for string in cut if string in contents]
+    if not found:
+        return None
+    contents = contents[: min(found)]
+    # The code is numbered in order, the blocks after the cut are dropped too
+    return contents, protected[: contents.count(utils.CODE_START)]
+
+
+# The repositories opened by every thread, a Repo can't be used by two threads
+_local = threading.local()
+_git_dirs: set[str] = set()  # the repositories opened by any thread
+_git_dirs_lock = threading.Lock()
+
+
+def _find_repo(dirname: str) -> Repo | None:
+    """Returns the git repository containing the directory, opened once per directory
+    by every thread."""
+    repos = getattr(_local, "repos", None)
+    if repos is None:
+        repos = _local.repos = {}
+    if dirname not in repos:
+        try:
+            repos[dirname] = Repo(dirname, search_parent_directories=True)
+        except (InvalidGitRepositoryError, NoSuchPathError):
+            repos[dirname] = None
+        else:
+            with _git_dirs_lock:
+                _git_dirs.add(repos[dirname].git_dir)
+    return repos[dirname]
+
+
+def _file_head(filepath: str) -> str:
+    """The commit checked out in the repository of the file, empty outside of git."""
+    repo = _find_repo(os.path.dirname(filepath))
+    if repo is None:
+        return ""
+    try:
+        return repo.head.commit.hexsha
+    except ValueError:  # no commits yet
+        return ""
+
 
-    return metadata, contents, utils.extract_links(contents)
+def _repo_heads() -> dict[str, str]:
+    """The commit checked out in every opened repository."""
+    with _git_dirs_lock:
+        git_dirs = sorted(_git_dirs)
+    heads = {}
+    for git_dir in git_dirs:
+        repo = _find_repo(git_dir)
+        try:
+            heads[git_dir] = repo.head.commit.hexsha if repo is not None else ""
+        except ValueError:  # no commits yet
+            heads[git_dir] = ""
+    return heads
@@ -4,10 +4,12 @@ from obsidown.operations.base import MdFile, MdOperations
 import bibtexparser
 import bibtexparser.middlewares as m
 import bibtexparser.model as model
+import os
 import re
-from obsidown import utils
+from obsidown.routes import RouteTable
 
-bibdict: dict[str, model.Entry] | None = None
+# bibfile -> (modification time, entries), kept between the builds of the server
+bibcache: dict[str, tuple[int, dict[str, model.Entry]]] = {}
 
 
 class RemoveTitleCurly(m.BlockMiddleware):
@@ -21,15 +23,18 @@ class RemoveTitleCurly(m.BlockMiddleware):
 
 
 class CitationConvert(MdOperations):
-    def __init__(self, bibfile: str, include_parentesis: bool = True):
+    def __init__(
+        self, routes: RouteTable, bibfile: str, include_parentesis: bool = True
+    ):
         """Load the bib file and store it in the object.
         bibfile can be a string or a path to the bibfile!?
         """
+        self.routes = routes
         self.include_parentesis = include_parentesis
         # use cache
-        global bibdict
-        if bibdict is not None:
-            self.bib = bibdict
+        mtime = os.stat(bibfile).st_mtime_ns
+        if bibfile in bibcache and bibcache[bibfile][0] == mtime:
+            self.bib = bibcache[bibfile][1]
             return
 
         with open(bibfile, "r") as f:
@@ -54,16 +59,20 @@ class CitationConvert(MdOperations):
             entries_dict[entry.key] = entry
 
         self.bib = entries_dict
-        bibdict = entries_dict
+        bibcache[bibfile] = (mtime, entries_dict)
+
+    def applies(self, file: MdFile) -> bool:
+        return "[[@" in file.contents
 
     def __call__(self, file: MdFile) -> MdFile:
         """Converts the citations in the markdown file to a link citation format."""
         new_contents = file.contents
-        citation_key_set: set[str] = set()
+        # dict keeps the order of the first citation, the numbering is the same every run
+        citation_keys: dict[str, None] = {}
 
         def convert_to_citation(match):
             citation_key = match.group(1)
-            citation_key_set.add(citation_key)
+            citation_keys.setdefault(citation_key)
 
             key = citation_key
             if key not in self.bib:
@@ -78,7 +87,8 @@ class CitationConvert(MdOperations):
                 return f'[{citation_string}]({entry["url"]})'
             else:
                 print(f"WARNING: No url in the bib entry {entry.key}")
-                return f'[{citation_string}](/notes/{utils.to_kebab_case(file.get_title())}#{key})'  # this has a lot of dependencies, should be refactored
+                url = self.routes.route(file.filename).url
+                return f"[{citation_string}]({url}#{key})"
 
         new_contents = re.sub(
             r"\[\[@([^\]]+?)(\|([^\]]+))?\]\]",
@@ -87,9 +97,9 @@ class CitationConvert(MdOperations):
         )
 
         # Should add config to see if needs to add a section of references at the end
-        if len(citation_key_set) != 0:
+        if len(citation_keys) != 0:
             new_contents += "\n\n# References\n\n"
-        for i, key in enumerate(citation_key_set):
+        for i, key in enumerate(citation_keys):
             entry = self.bib[key]
             new_contents += f"<p id={key}>[{i+1}] {self._format_long_citation(entry)}\n\n </p>\n"
 
@@ -98,6 +108,7 @@ class CitationConvert(MdOperations):
             contents=new_contents,
             references=file.references,
             filename=file.filename,
+            protected=file.protected,
         )
 
     def _format_citation(self, entry: model.Entry):
@@ -1,21 +1,36 @@
 from obsidown.config import Config
 from obsidown.operations.base import MdOperations
 from obsidown.operations.citations import CitationConvert
+from obsidown.operations.embed import Embed
+from obsidown.operations.feed import Feed
+from obsidown.operations.link_check import LinkCheck
 from obsidown.operations.link_convert import LinkConvert
+from obsidown.operations.link_graph import LinkGraphExport
 from obsidown.operations.math_convert import MathConvert
+from obsidown.operations.regex_replace import RegexReplace
 from obsidown.operations.remove_after_string import RemoveAfterString
 from obsidown.operations.remove_single_char_lines import RemoveSingleCharLines
+from obsidown.operations.search_index import SearchIndex
+from obsidown.operations.taxonomy import Taxonomy
 from obsidown.operations.update_frontmatter import UpdateFrontMatter
 from obsidown.operations.write_file import WriteFile
+from obsidown.output import Output
+from obsidown.vault import Vault
 
 
 def dispatch(
-    name: str, config: Config, not_cited_refs: list[str], *args, **kwargs
+    name: str, config: Config, vault: Vault, output: Output, *args, **kwargs
 ) -> MdOperations:
     """Dispatch the operation to the correct class."""
     match name:
         case "link_convert":
-            return LinkConvert(config, not_cited_refs, *args, **kwargs)
+            return LinkConvert(config, vault, *args, **kwargs)
+        case "link_check":
+            return LinkCheck(config, *args, **kwargs)
+        case "link_graph":
+            return LinkGraphExport(config, vault, output, *args, **kwargs)
+        case "regex_replace":
+            return RegexReplace(*args, **kwargs)
         case "remove_after_string":
             return RemoveAfterString(*args, **kwargs)
         case "remove_single_char_lines":
@@ -25,8 +40,16 @@ def dispatch(
         case "update_frontmatter":
             return UpdateFrontMatter(config, *args, **kwargs)
         case "write_file":
-            return WriteFile(config, *args, **kwargs)
+            return WriteFile(config, vault.routes, output, *args, **kwargs)
+        case "search_index":
+            return SearchIndex(config, vault, output, *args, **kwargs)
+        case "embed":
+            return Embed(config, vault, *args, **kwargs)
+        case "feed":
+            return Feed(config, vault, output, *args, **kwargs)
+        case "taxonomy":
+            return Taxonomy(config, vault, output, *args, **kwargs)
         case "citation_convert":
-            return CitationConvert(*args, **kwargs)
+            return CitationConvert(vault.routes, *args, **kwargs)
         case _:
             raise ValueError(f"Unknown operation: {name}")
@@ -0,0 +1,104 @@
+"""Transclusion of the notes embedded with `![[Note]]` or `![[Note#Heading]]`."""
+
+from obsidown import utils
+from obsidown.config import Config
+from obsidown.operations.base import MdFile, MdOperations
+from obsidown.vault import Vault
+
+
+class Embed(MdOperations):
+    """Replaces the embeds with the contents of the note, or of its section.
+
+    The embedded notes go through the operations placed before this one, so they look
+    like they would in their own page: these operations can't be stateful. Every note and section is rendered once per
+    build, however many notes embed it. A note embedding itself, also through other
+    notes, raises an error. The embeds of the notes not in the vault are left to
+    `link_convert`, which turns them into links.
+    """
+
+    needs_vault = True
+    embeds_notes = True
+
+    def __init__(self, config: Config, vault: Vault):
+        self.config = config
+        self.vault = vault
+        self.previous: list[MdOperations] = []
+        self.rendered: dict[str, MdFile] = {}  # the notes after the previous operations
+        # (filename, heading or None) -> rendered fragment and its references
+        self.fragments: dict[tuple[str, str | None], tuple[str, list[str]]] = {}
+
+    def setup(self, pipeline: list[MdOperations]):
+        self.previous = pipeline[: pipeline.index(self)]
+        for operation in self.previous:
+            if operation.stateful:
+                raise ValueError(
+                    f"{type(operation).__name__} would also see the embedded notes,"
+                    " place it after embed"
+                )
+
+    def applies(self, file: MdFile) -> bool:
+        return "![[" in file.contents
+
+    def __call__(self, file: MdFile) -> MdFile:
+        references = list(file.references)
+        contents = self._expand(file.contents, [file.filename], references)
+        # The fragments come with their code, protect again the code of the whole note
+        contents, protected = utils.protect_code(
+            utils.restore_code(contents, file.protected)
+        )
+        return MdFile(
+            metadata=file.metadata,
+            contents=contents,
+            references=references,
+            filename=file.filename,
+            protected=protected,
+        )
+
+    def _expand(self, contents: str, stack: list[str], references: list[str]) -> str:
+        """Replaces the embeds in the contents, `stack` has the notes being rendered."""
+
+        def replace(match):
+            name, heading = match.group(1).strip(), match.group(2)
+            note = self.vault.by_name.get(name)
+            if utils.is_image(name) or note is None:
+                return match.group(0)
+            fragment, fragment_references = self._fragment(note, heading, stack)
+            for reference in fragment_references:
+                if reference not in references:
+                    references.append(reference)
+            return fragment
+
+        return utils.EMBED_PATTERN.sub(replace, contents)
+
+    def _fragment(
+        self, note: MdFile, heading: str | None, stack: list[str]
+    ) -> tuple[str, list[str]]:
+        """The text of the note, or of its section, with the embeds replaced."""
+        key = (note.filename, heading)
+        if key in self.fragments:
+            return self.fragments[key]
+        if note.filename in stack:
+            cycle = " -> ".join(stack + [note.filename])
+            raise ValueError(f"Notes embedding themselves: {cycle}")
+
+        note = self._render(note)
+        contents = note.contents
+        if heading is not None:
+            contents = utils.extract_section(contents, heading)
+
+        references = utils.extract_links(contents)
+        contents = self._expand(contents, stack + [note.filename], references)
+        fragment = utils.restore_code(contents, note.protected).strip()
+
+        self.fragments[key] = (fragment, references)
+        return self.fragments[key]
+
+    def _render(self, note: MdFile) -> MdFile:
+        """The note after the operations placed before this one."""
+        if note.filename not in self.rendered:
+            rendered = note
+            for operation in self.previous:
+                if operation.applies(rendered):
+                    rendered = operation(rendered)
+            self.rendered[note.filename] = rendered
+        return self.rendered[note.filename]
@@ -0,0 +1,141 @@
+"""RSS or Atom feed of the most recently changed notes."""
+
+import datetime
+import heapq
+import xml.etree.ElementTree as ET
+from email.utils import format_datetime
+
+from obsidown.config import Config
+from obsidown.operations.base import MdFile, MdOperations
+from obsidown.output import Output
+from obsidown.vault import Vault, note_name
+
+ATOM_NS = "http://www.w3.org/2005/Atom"
+# The date of an empty feed
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+class Feed(MdOperations):
+    """Keeps the `size` notes with the latest commit in a bounded heap and writes them
+    as a feed in `output.filesystem/path`.
+
+    The feed is rewritten only when its contents change: its date is the one of the
+    newest note, not the time of the build.
+    """
+
+    stateful = True
+
+    def __init__(
+        self,
+        config: Config,
+        vault: Vault,
+        output: Output,
+        path: str = "index.xml",
+        format: str = "rss",
+        size: int = 20,
+        title: str = "Notes",
+        description: str = "",
+        site: str = "",
+    ):
+        if format not in ("rss", "atom"):
+            raise ValueError(f"Unknown feed format: {format}")
+        self.config = config
+        self.vault = vault
+        self.output = output
+        self.path = path  # relative to output.filesystem
+        self.format = format
+        self.size = size
+        self.title = title
+        self.description = description
+        self.site = site.rstrip("/")  # the urls of a feed must be absolute
+
+        # min heap of (timestamp, url, entry), the oldest of the kept notes on top
+        self.heap: list[tuple[float, str, dict]] = []
+
+    def __call__(self, file: MdFile) -> MdFile:
+        """Keeps the note if it is among the latest changed, should run after the transforms."""
+        self._push(file)
+        return file
+
+    def resumed(self, file: MdFile):
+        self._push(file)
+
+    def _push(self, file: MdFile):
+        # update_frontmatter drops the commit time from the metadata
+        updated = file.metadata.get("last_commit_time") or self.vault.commit_times.get(
+            file.filename
+        )
+        if updated is None or self.size <= 0:
+            return
+        if updated.tzinfo is None:  # the same on every machine
+            updated = updated.replace(tzinfo=datetime.timezone.utc)
+
+        url = self.site + self.vault.routes.route(file.filename).url
+        item = (updated.timestamp(), url)
+        if len(self.heap) == self.size and item <= self.heap[0][:2]:
+            return
+
+        entry = {
+            "title": str(file.metadata.get("title", note_name(file.filename))),
+            "url": url,
+            "updated": updated,
+            "summary": str(file.metadata.get("summary", "")),
+        }
+        if len(self.heap) < self.size:
+            heapq.heappush(self.heap, (*item, entry))
+        else:
+            heapq.heapreplace(self.heap, (*item, entry))
+
+    def finalize(self):
+        """Writes the feed, newest notes first, if it changed."""
+        entries = [entry for _, _, entry in sorted(self.heap, reverse=True)]
+        if self.format == "atom":
+            root = self._atom(entries)
+        else:
+            root = self._rss(entries)
+        ET.indent(root)
+        contents = ET.tostring(root, encoding="utf-8", xml_declaration=True)
+        if self.output.unchanged_contents(self.path, contents):
+            self.output.keep(self.path)
+        else:
+            self.output.write(self.path, contents)
+
+    def _link(self) -> str:
+        return self.site + "/" + self.config.output.base
+
+    def _rss(self, entries: list[dict]) -> ET.Element:
+        rss = ET.Element("rss", version="2.0")
+        channel = ET.SubElement(rss, "channel")
+        ET.SubElement(channel, "title").text = self.title
+        ET.SubElement(channel, "link").text = self._link()
+        ET.SubElement(channel, "description").text = self.description
+        if entries:
+            ET.SubElement(channel, "lastBuildDate").text = format_datetime(
+                entries[0]["updated"]
+            )
+        for entry in entries:
+            item = ET.SubElement(channel, "item")
+            ET.SubElement(item, "title").text = entry["title"]
+            ET.SubElement(item, "link").text = entry["url"]
+            ET.SubElement(item, "guid").text = entry["url"]
+            ET.SubElement(item, "pubDate").text = format_datetime(entry["updated"])
+            if entry["summary"]:
+                ET.SubElement(item, "description").text = entry["summary"]
+        return rss
+
+    def _atom(self, entries: list[dict]) -> ET.Element:
+        feed = ET.Element("feed", xmlns=ATOM_NS)
+        ET.SubElement(feed, "title").text = self.title
+        ET.SubElement(feed, "id").text = self._link()
+        ET.SubElement(feed, "link", href=self._link())
+        updated = entries[0]["updated"] if entries else EPOCH
+        ET.SubElement(feed, "updated").text = updated.isoformat()
+        for entry in entries:
+            element = ET.SubElement(feed, "entry")
+            ET.SubElement(element, "title").text = entry["title"]
+            ET.SubElement(element, "id").text = entry["url"]
+            ET.SubElement(element, "link", href=entry["url"])
+            ET.SubElement(element, "updated").text = entry["updated"].isoformat()
+            if entry["summary"]:
+                ET.SubElement(element, "summary").text = entry["summary"]
+        return feed
@@ -0,0 +1,75 @@
+"""Report of the broken external links of the notes."""
+
+import json
+import os
+
+from obsidown import utils
+from obsidown.config import Config
+from obsidown.linkcheck import LinkChecker
+from obsidown.operations.base import MdFile, MdOperations
+
+
+class LinkCheck(MdOperations):
+    """Collects the external urls of the notes and checks them once at the end.
+
+    Every url is checked once, however many notes link it, and the results are
+    cached in `cache` for `ttl` seconds, `error_ttl` for the unreachable servers. The
+    broken links are printed by note and
+    written as json in `report`, if given.
+    """
+
+    stateful = True
+
+    def __init__(
+        self,
+        config: Config,
+        cache: str = ".obsidown/links.json",
+        ttl: float = 86400,
+        concurrency: int = 16,
+        delay: float = 0.5,
+        timeout: float = 10,
+        report: str | None = None,
+        error_ttl: float = 3600,
+    ):
+        self.config = config
+        self.checker = LinkChecker(cache, ttl, concurrency, delay, timeout, error_ttl)
+        self.report = report
+        self.urls: dict[str, list[str]] = {}  # filename -> urls
+
+    def applies(self, file: MdFile) -> bool:
+        return "http" in file.contents
+
+    def __call__(self, file: MdFile) -> MdFile:
+        """Collects the urls of the note, outside of the code."""
+        urls = utils.extract_urls(file.contents)
+        if urls:
+            self.urls[file.filename] = list(dict.fromkeys(urls))
+        return file
+
+    def finalize(self):
+        """Checks the urls and reports the broken ones."""
+        urls = [url for urls in self.urls.values() for url in urls]
+        results = self.checker.check(urls)
+        self.checker.save_cache()
+
+        broken: dict[str, list[dict]] = {}
+        for filename, note_urls in sorted(self.urls.items()):
+            for url in note_urls:
+                result = results.get(url)
+                if result is None or (result["status"] or 999) < 400:
+                    continue
+                broken.setdefault(filename, []).append({"url": url, **result})
+
+        print(
+            f"Checked {len(results)} links ({self.checker.requests} requests),"
+            f" {sum(len(links) for links in broken.values())} broken"
+        )
+        for filename, links in broken.items():
+            print(f"  {filename}")
+            for link in links:
+                print(f"    {link['url']}: {link['error'] or link['status']}")
+
+        if self.report is not None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.report)), exist_ok=True)
+            with open(self.report, "w") as f:
+                json.dump(broken, f, indent=2)
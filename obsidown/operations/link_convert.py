@@ -1,27 +1,53 @@
-from typing import Iterable
 from obsidown import utils
 from obsidown.config import Config
 from obsidown.operations.base import MdFile, MdOperations
+from obsidown.vault import Vault
 
 
 class LinkConvert(MdOperations):
-    def __init__(self, config: Config, not_cited_refs: Iterable[str]):
+    def __init__(self, config: Config, vault: Vault):
         self.config = config
-        self.not_cited_refs = not_cited_refs
+        self.vault = vault
 
     def __call__(self, file: MdFile) -> MdFile:
         """Converts the links from the notes into the correct format for the markdown files."""
 
         contents = utils.convert_external_links(file.contents)
         if len(file.references) > 0:
-            contents = utils.filter_link(contents, self.not_cited_refs)
+            not_cited_refs = self.vault.not_cited_refs(file)
+            contents = utils.filter_link(contents, not_cited_refs)
             contents = utils.convert_images(contents, "/" + self.config.output.images)
-            contents = utils.convert_links(contents, "/" + self.config.output.base)
-        contents = utils.convert_links(contents)
+            if self.config.image_export.dedup:
+                contents = self._rewrite_images(contents, file)
+            if self.config.image_export.responsive:
+                contents = utils.convert_responsive_images(
+                    contents,
+                    "/" + self.config.output.images,
+                    self.config.image_export.webp,
+                )
+            contents = utils.convert_links(
+                contents, "/" + self.config.output.base, self.vault.routes.slug
+            )
+        contents = utils.convert_links(contents, slug=self.vault.routes.slug)
 
         return MdFile(
             metadata=file.metadata,
             contents=contents,
             references=file.references,
             filename=file.filename,
+            protected=file.protected,
+        )
+
+    def _rewrite_images(self, contents: str, file: MdFile) -> str:
+        """Points the images to their deduplicated copy."""
+        names = {}
+        for ref in file.references:
+            ref = ref.split("|")[0]
+            if utils.is_image(ref):
+                name = self.vault.image_store.canonical_name(ref)
+                if name is not None:
+                    names[ref] = name
+
+        return utils.rewrite_image_sources(
+            contents, "/" + self.config.output.images, names
         )
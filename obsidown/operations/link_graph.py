@@ -0,0 +1,66 @@
+import json
+
+from obsidown.config import Config
+from obsidown.operations.base import MdFile, MdOperations
+from obsidown.output import Output
+from obsidown.vault import Vault, note_name
+
+
+class LinkGraphExport(MdOperations):
+    """Adds the backlinks to the frontmatter and writes the link graph of the vault.
+
+    Should run after `update_frontmatter`, which rebuilds the metadata from scratch.
+    """
+
+    needs_vault = True
+
+    def __init__(
+        self,
+        config: Config,
+        vault: Vault,
+        output: Output,
+        path: str = "graph.json",
+        key: str = "backlinks",
+    ):
+        self.config = config
+        self.vault = vault
+        self.output = output
+        self.path = path  # relative to output.filesystem
+        self.key = key
+
+    def __call__(self, file: MdFile) -> MdFile:
+        """Adds the notes linking to this file in the frontmatter."""
+        graph = self.vault.graph
+        node = graph.id(note_name(file.filename))
+
+        metadata = dict(file.metadata)
+        metadata[self.key] = [
+            {
+                "title": graph.names[source],
+                "url": self.vault.routes.url(graph.names[source]),
+            }
+            for source in graph.backlinks(node)
+        ]
+
+        return MdFile(
+            metadata=metadata,
+            contents=file.contents,
+            references=file.references,
+            filename=file.filename,
+            protected=file.protected,
+        )
+
+    def finalize(self):
+        """Writes the nodes and the edges of the graph as json."""
+        graph = self.vault.graph
+        nodes = [
+            {"id": node, "title": name, "url": self.vault.routes.url(name)}
+            for node, name in enumerate(graph.names)
+        ]
+        links = [
+            {"source": source, "target": target} for source, target in graph.edges()
+        ]
+
+        self.output.write(
+            self.path, json.dumps({"nodes": nodes, "links": links}).encode()
+        )
@@ -6,6 +6,9 @@ class MathConvert(MdOperations):
     def __init__(self, engine: str = "mathjax"):
         self.engine = engine
 
+    def applies(self, file: MdFile) -> bool:
+        return "$" in file.contents
+
     def __call__(self, file: MdFile) -> MdFile:
         """Converts the math equations from the notes into the correct format for the markdown files."""
         # TODO: handle the | inside the math equations""
@@ -20,4 +23,5 @@ class MathConvert(MdOperations):
             contents=contents,
             references=file.references,
             filename=file.filename,
+            protected=file.protected,
         )
@@ -0,0 +1,111 @@
+"""Replacements of regular expressions, configured in the pipeline."""
+
+import re
+
+from obsidown import utils
+from obsidown.operations.base import MdFile, MdOperations
+
+SCOPES = ("text", "code", "all")
+# The placeholders of the code in the contents, the text rules never touch them
+PLACEHOLDER = re.compile(f"({utils.CODE_START}[0-9]+{utils.CODE_END})")
+# An escaped backslash, or a reference to a group: `\1`, `(?P=name)` or `(?(1)...)`
+REFERENCE = re.compile(r"\\\\|\\[1-9]|\(\?P=|\(\?\(")
+
+
+class RegexReplace(MdOperations):
+    """Applies a list of regex replacements to the notes in a single scan.
+
+    Every rule has a `pattern`, a `replacement` (which can use the groups of the
+    pattern, e.g. `\\1`), a `scope` and optionally a `name` for the report. The scope
+    is `text` for the contents outside of the code (the default), `code` for the
+    code blocks and the inline code only, or `all`.
+
+    The patterns are compiled once in a single alternation: at every position the
+    first rule matching wins, and the rules never see the replacements of the others.
+    The text rules run between the code of the note, never across it. The patterns
+    can't refer to their groups, e.g. with `\\1` or `(?P=name)`, the names of the
+    groups must differ between the rules and the flags must be scoped, e.g.
+    `(?i:todo)`.
+    """
+
+    stateful = True
+
+    def __init__(self, rules: list[dict]):
+        self.rules = []
+        for i, rule in enumerate(rules):
+            scope = rule.get("scope", "text")
+            if scope not in SCOPES:
+                raise ValueError(f"Unknown scope {scope} of the rule {i}, use {SCOPES}")
+            references = REFERENCE.findall(rule["pattern"])
+            if any(reference != "\\\\" for reference in references):
+                raise ValueError(
+                    f"The rule {i} refers to a group of its pattern, which can't be"
+                    " combined with the other rules"
+                )
+            self.rules.append(
+                {
+                    "name": rule.get("name", rule["pattern"]),
+                    "pattern": re.compile(rule["pattern"]),
+                    "replacement": rule.get("replacement", ""),
+                    "scope": scope,
+                }
+            )
+        self.hits = [0] * len(self.rules)
+
+        self.text = self._combine(lambda rule: rule["scope"] != "code")
+        self.code = self._combine(lambda rule: rule["scope"] != "text")
+
+    def _combine(self, selected) -> tuple[re.Pattern, list[tuple[int, int]]] | None:
+        """One pattern matching any of the selected rules, with the number of the
+        group wrapping every rule and the index of the rule."""
+        parts = []
+        groups = []
+        group = 1
+        for index, rule in enumerate(self.rules):
+            if not selected(rule):
+                continue
+            parts.append(f"({rule['pattern'].pattern})")
+            groups.append((group, index))
+            group += 1 + rule["pattern"].groups
+        if not parts:
+            return None
+        try:
+            return re.compile("|".join(parts)), groups
+        except re.error as e:  # e.g. the same group name in two rules
+            raise ValueError(f"The rules can't be combined in one pattern: {e}")
+
+    def _replace(self, combined, text: str) -> str:
+        if combined is None:
+            return text
+        pattern, groups = combined
+
+        def replace(match):
+            for group, index in groups:
+                if match.group(group) is not None:
+                    self.hits[index] += 1
+                    rule = self.rules[index]
+                    # Match again with the rule alone, for its own group numbers
+                    own = rule["pattern"].match(match.string, match.start())
+                    return own.expand(rule["replacement"])
+            return match.group(0)
+
+        return pattern.sub(replace, text)
+
+    def __call__(self, file: MdFile) -> MdFile:
+        # The odd parts are the placeholders of the code, kept as they are
+        parts = PLACEHOLDER.split(file.contents)
+        parts[::2] = [self._replace(self.text, part) for part in parts[::2]]
+        contents = "".join(parts)
+        protected = [self._replace(self.code, code) for code in file.protected]
+        return MdFile(
+            metadata=file.metadata,
+            contents=contents,
+            references=file.references,
+            filename=file.filename,
+            protected=protected,
+        )
+
+    def counts(self) -> dict[str, int]:
+        return {
+            f"{rule['name']} hits": hits for rule, hits in zip(self.rules, self.hits)
+        }
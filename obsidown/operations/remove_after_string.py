@@ -1,12 +1,28 @@
 from obsidown import utils
+from obsidown.config import Config
 from obsidown.operations.base import MdFile, MdOperations
 
 
+def cut_markers(config: Config) -> tuple[str, ...]:
+    """The strings of the `remove_after_string` operations starting the pipeline,
+    without `line`: the notes can be read only up to the first of them."""
+    markers = []
+    for operation in config.pipeline:
+        if operation.name != "remove_after_string" or operation.options.get("line"):
+            break
+        markers.append(operation.options["string"])
+    return tuple(markers)
+
+
 class RemoveAfterString(MdOperations):
     def __init__(self, string: str, line: bool = False):
         self.to_remove = string
         self.line = line
 
+    def applies(self, file: MdFile) -> bool:
+        # The line mode drops the lines without the string
+        return self.line or self.to_remove in file.contents
+
     def __call__(self, file: MdFile) -> MdFile:
         """Converts the math equations from the notes into the correct format for the markdown files."""
         contents = utils.remove_after_string(file.contents, self.to_remove, line=self.line)
@@ -14,5 +30,7 @@ class RemoveAfterString(MdOperations):
             filename=file.filename,
             metadata=file.metadata,
             contents=contents,
-            references=file.references,
+            # The links removed with the contents are not referenced anymore
+            references=utils.extract_links(contents),
+            protected=file.protected,
         )
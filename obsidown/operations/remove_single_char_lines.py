@@ -17,5 +17,6 @@ class RemoveSingleCharLines(MdOperations):
             metadata=file.metadata,
             contents=contents,
             references=file.references,
+            protected=file.protected,
         )
 
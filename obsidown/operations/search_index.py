@@ -0,0 +1,169 @@
+"""Build an inverted index of the processed notes for the client side search."""
+
+import hashlib
+import heapq
+import json
+import os
+from collections import Counter
+
+from obsidown import utils
+from obsidown.config import Config
+from obsidown.operations.base import MdFile, MdOperations, state_path
+from obsidown.output import Output
+from obsidown.vault import Vault, note_name
+
+
+class SearchIndex(MdOperations):
+    """Tokenizes the contents of every note and writes a sharded inverted index.
+
+    The index is written in `output.filesystem/path`:
+    - `index.json` has the list of the documents, indexed by doc id, and of the shards,
+    - `<prefix>.json` maps every term starting with `prefix` to its posting list,
+      a flat list of `[doc id gap, term frequency, ...]` with delta encoded doc ids.
+
+    The terms and the doc id of every note are kept in `build.state`, outside of the
+    output, together with the hash of its contents, so the next run tokenizes only
+    the notes that changed.
+    A note keeps its doc id between runs, the ids of the removed notes are reused
+    by the new ones (`null` in the documents until then): adding or removing a note
+    rewrites only the shards of its terms.
+    """
+
+    stateful = True
+
+    def __init__(
+        self,
+        config: Config,
+        vault: Vault,
+        output: Output,
+        path: str = "search",
+        prefix_length: int = 1,
+    ):
+        self.config = config
+        self.vault = vault
+        self.output = output
+        self.path = path  # relative to output.filesystem
+        self.prefix_length = prefix_length
+
+        self.state_path = state_path(config, "search_index", path)
+        self.previous: dict[str, dict] = {}  # url -> {"title", "hash", "terms", "id"}
+        self.free: list[int] = []  # the ids of the removed notes
+        if os.path.exists(self.state_path):
+            with open(self.state_path, "r") as f:
+                state = json.load(f)
+            self.previous, self.free = state["docs"], state["free"]
+        self.docs: dict[str, dict] = {}
+
+    def __call__(self, file: MdFile) -> MdFile:
+        """Collects the terms of the note, should run after the other transforms."""
+        name = note_name(file.filename)
+        url = self.vault.routes.route(file.filename).url
+        text = file.text()
+        digest = hashlib.sha1(text.encode()).hexdigest()
+
+        previous = self.previous.get(url)
+        if previous is not None and previous["hash"] == digest:
+            terms = previous["terms"]
+        else:
+            terms = dict(Counter(utils.tokenize(text)))
+
+        self.docs[url] = {
+            "title": str(file.metadata.get("title", name)),
+            "hash": digest,
+            "terms": terms,
+        }
+        if previous is not None and "id" in previous:
+            self.docs[url]["id"] = previous["id"]
+        return file
+
+    def resumed(self, file: MdFile):
+        """Keeps the terms of the last finished run, the note is not processed again."""
+        url = self.vault.routes.route(file.filename).url
+        if url in self.previous:
+            self.docs[url] = self.previous[url]
+
+    def finalize(self):
+        """Writes the shards of the index and the state for the next run."""
+        docs = self._number_docs()
+
+        postings: dict[str, list[tuple[int, int]]] = {}
+        for doc_id, doc in enumerate(docs):
+            if doc is None:
+                continue
+            for term, frequency in doc["terms"].items():
+                postings.setdefault(term, []).append((doc_id, frequency))
+
+        shards: dict[str, dict[str, list[int]]] = {}
+        for term in sorted(postings):
+            ids = utils.delta_encode([doc_id for doc_id, _ in postings[term]])
+            encoded = []
+            for gap, (_, frequency) in zip(ids, postings[term]):
+                encoded += [gap, frequency]
+            shards.setdefault(term[: self.prefix_length], {})[term] = encoded
+
+        for prefix, shard in shards.items():
+            self._write(prefix + ".json", json.dumps(shard, separators=(",", ":")))
+
+        # Remove the shards that have no more terms, an archive has only the new ones
+        index_path = self.output.path(os.path.join(self.path, "index.json"))
+        if self.output.archive is None and os.path.exists(index_path):
+            with open(index_path, "r") as f:
+                for prefix in json.load(f)["shards"]:
+                    if prefix not in shards:
+                        self.output.remove(os.path.join(self.path, prefix + ".json"))
+
+        index = {
+            "prefix_length": self.prefix_length,
+            "shards": sorted(shards),
+            "docs": [
+                None if doc is None else {"title": doc["title"], "url": doc["url"]}
+                for doc in docs
+            ],
+        }
+        self._write("index.json", json.dumps(index, separators=(",", ":")))
+        # The state of the older versions was published with the index
+        self.output.remove(os.path.join(self.path, ".state.json"))
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.state_path)), exist_ok=True)
+        with open(self.state_path, "w") as f:
+            json.dump({"docs": self.docs, "free": self.free}, f, sort_keys=True)
+
+    def _number_docs(self) -> list[dict | None]:
+        """Gives a doc id to the new notes and frees the ids of the removed ones.
+
+        Returns the documents indexed by doc id, with their url, None for the free
+        ids. The new notes take the smallest free ids, in the order of their urls.
+        """
+        free = set(self.free)
+        for url, doc in self.previous.items():
+            if url not in self.docs and "id" in doc:
+                free.add(doc["id"])
+        free.difference_update(doc["id"] for doc in self.docs.values() if "id" in doc)
+        free_ids = sorted(free)  # a sorted list is a heap
+
+        used = [doc["id"] for doc in self.docs.values() if "id" in doc]
+        next_id = max(used + free_ids, default=-1) + 1
+        for url in sorted(self.docs):
+            if "id" not in self.docs[url]:
+                if free_ids:
+                    self.docs[url]["id"] = heapq.heappop(free_ids)
+                else:
+                    self.docs[url]["id"] = next_id
+                    next_id += 1
+
+        # The free ids after the last note are not kept
+        size = max((doc["id"] for doc in self.docs.values()), default=-1) + 1
+        self.free = [doc_id for doc_id in sorted(free_ids) if doc_id < size]
+        docs: list[dict | None] = [None] * size
+        for url, doc in self.docs.items():
+            docs[doc["id"]] = dict(doc, url=url)
+        return docs
+
+    def _write(self, name: str, contents: str):
+        """Writes the file only if its contents changed."""
+        path = os.path.join(self.path, name)
+        data = contents.encode()
+        if self.output.unchanged_contents(path, data):
+            self.output.keep(path)
+        else:
+            self.output.write(path, data)
@@ -0,0 +1,114 @@
+"""Listing pages of the tags of the notes, aggregated during the build."""
+
+import hashlib
+import json
+import os
+
+import frontmatter
+
+from obsidown import utils
+from obsidown.config import Config
+from obsidown.operations.base import MdFile, MdOperations, state_path
+from obsidown.operations.update_frontmatter import NO_TAGS
+from obsidown.output import Output
+from obsidown.vault import Vault, note_name
+
+
+class Taxonomy(MdOperations):
+    """Collects the tags of the notes in an inverted index and writes a page for every
+    tag in `output.filesystem/path`, listing its notes ordered by weight.
+
+    Should run after `update_frontmatter`, which sets the tags and the weights. The
+    notes of every tag and the hash of every page are kept in `build.state`, outside
+    of the output: the next run rewrites only the pages whose notes or order changed,
+    and removes the pages of the tags no note has anymore.
+    """
+
+    stateful = True
+
+    def __init__(
+        self,
+        config: Config,
+        vault: Vault,
+        output: Output,
+        path: str = "tags",
+        title: str = "{tag}",
+    ):
+        self.config = config
+        self.vault = vault
+        self.output = output
+        self.path = path  # relative to output.filesystem
+        self.title = title  # of the pages, formatted with the tag
+
+        self.state_path = state_path(config, "taxonomy", path)
+        self.previous: dict = {"notes": {}, "pages": {}}
+        if os.path.exists(self.state_path):
+            with open(self.state_path, "r") as f:
+                self.previous = json.load(f)
+        self.notes: dict[str, dict] = {}  # url -> {"title", "weight", "tags"}
+
+    def __call__(self, file: MdFile) -> MdFile:
+        """Adds the note to the pages of its tags."""
+        tags = file.metadata.get("tags") or []
+        if isinstance(tags, str):
+            tags = [tags]
+        url = self.vault.routes.route(file.filename).url
+        self.notes[url] = {
+            "title": str(file.metadata.get("title", note_name(file.filename))),
+            "weight": file.metadata.get("weight", 0),
+            "tags": sorted({str(tag) for tag in tags}),
+        }
+        return file
+
+    def resumed(self, file: MdFile):
+        """Keeps the tags of the last finished run, the note is not processed again."""
+        url = self.vault.routes.route(file.filename).url
+        if url in self.previous["notes"]:
+            self.notes[url] = self.previous["notes"][url]
+
+    def finalize(self):
+        """Writes the pages of the tags that changed and removes the unused ones."""
+        # The tags with the same page are the same, e.g. differing only by case as in
+        # obsidian. The notes without tags have no page
+        index: dict[str, list[tuple]] = {}  # name of the page -> notes
+        spellings: dict[str, set[str]] = {}
+        for url, note in self.notes.items():
+            names = set()
+            for tag in note["tags"]:
+                if tag == NO_TAGS:
+                    continue
+                name = utils.to_kebab_case(tag.casefold()) + ".md"
+                names.add(name)
+                spellings.setdefault(name, set()).add(tag)
+            for name in names:
+                index.setdefault(name, []).append((note["weight"], note["title"], url))
+
+        pages: dict[str, str] = {}  # name of the page -> hash of its contents
+        for name in sorted(index):
+            tag = min(spellings[name])  # the same spelling every run
+            notes = sorted(index[name])
+            body = "".join(f"- [{title}]({url})\n" for _, title, url in notes)
+            page = frontmatter.Post(
+                body, title=self.title.format(tag=tag), tag=tag, count=len(notes)
+            )
+            data = frontmatter.dumps(page).encode()
+            pages[name] = hashlib.sha1(data).hexdigest()
+
+            path = os.path.join(self.path, name)
+            changed = self.previous["pages"].get(name) != pages[name]
+            # An unchanged page is not read again, only checked to be still there
+            if changed or not self.output.exists(path):
+                self.output.write(path, data)
+            else:
+                self.output.keep(path)
+
+        for name in self.previous["pages"]:
+            if name not in pages:
+                self.output.remove(os.path.join(self.path, name))
+
+        # The state of the older versions was published with the pages
+        self.output.remove(os.path.join(self.path, ".state.json"))
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.state_path)), exist_ok=True)
+        with open(self.state_path, "w") as f:
+            json.dump({"notes": self.notes, "pages": pages}, f, sort_keys=True)
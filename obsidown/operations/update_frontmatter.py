@@ -1,11 +1,13 @@
+import hashlib
 import os
-import random
 
 from obsidown import utils
 from obsidown.config import Config
 from obsidown.operations.base import MdFile, MdOperations
 import copy
 
+NO_TAGS = "no-tags"  # the tag of the notes without tags
+
 
 class UpdateFrontMatter(MdOperations):
     def __init__(self, config: Config, frontmatter: dict[str, str]):
@@ -50,7 +52,7 @@ class UpdateFrontMatter(MdOperations):
         if "tags" in file.metadata:
             metadata["tags"] = file.metadata["tags"]
         else:
-            metadata["tags"] = ["no-tags"]
+            metadata["tags"] = [NO_TAGS]
 
         if "summary" in file.metadata:
             metadata["summary"] = file.metadata["summary"]
@@ -63,11 +65,14 @@ class UpdateFrontMatter(MdOperations):
             if "last_commit_time" in file.metadata:
                 metadata["weight"] = utils.interpolate_weight(file.metadata["last_commit_time"])
             else:
-                metadata["weight"] = random.randint(1, 50)  # play lottery lol
+                # stable between runs, so an unchanged note is written the same
+                digest = hashlib.sha256(file.text().encode()).digest()
+                metadata["weight"] = int.from_bytes(digest[:4], "big") % 50 + 1
 
         return MdFile(
             metadata=metadata,
             contents=file.contents,
             references=file.references,
             filename=file.filename,
+            protected=file.protected,
         )
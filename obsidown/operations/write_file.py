@@ -1,25 +1,29 @@
-import os
 import frontmatter
 
 from obsidown.config import Config
 from obsidown.operations.base import MdFile, MdOperations
+from obsidown.output import Output
+from obsidown.routes import RouteTable
 
 
 class WriteFile(MdOperations):
-    def __init__(self, config: Config):
+    stateful = True
+
+    def __init__(self, config: Config, routes: RouteTable, output: Output):
         self.config = config
+        self.routes = routes
+        self.output = output
 
     def __call__(self, file: MdFile) -> MdFile:
         """Writes the markdown files to the output directory."""
 
-        end_path = os.path.join(
-            self.config.output.filesystem,
-            self.config.output.path,
-            os.path.basename(file.filename),
-        )
+        end_path = self.routes.route(file.filename).output_path
 
-        end_content = frontmatter.Post(file.contents, **file.metadata)
-        with open(end_path, "w") as f:
-            f.write(frontmatter.dumps(end_content))
+        end_content = frontmatter.Post(file.text(), **file.metadata)
+        self.output.write(end_path, frontmatter.dumps(end_content).encode())
 
         return file
+
+    def resumed(self, file: MdFile):
+        """The file written by the resumed build stays in the output."""
+        self.output.keep(self.routes.route(file.filename).output_path)
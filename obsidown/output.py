@@ -0,0 +1,243 @@
+"""Writing of the files produced by the build."""
+
+import filecmp
+import hashlib
+import json
+import os
+import queue
+import shutil
+import threading
+
+from obsidown.archive import Archive
+
+
+class Output:
+    """Writes the files under the output directory.
+
+    With `writers > 0` the writes are queued and done by writer threads, so the
+    pipeline doesn't wait for the disk. The queue holds at most `queue_size` files.
+    The first error of the writers is raised by the next `write` or by `close`,
+    which must be called at the end of the build to flush the queue.
+
+    With `skip_unchanged` a file already holding the same bytes is left untouched, so
+    its modification time doesn't change and the tools syncing the output skip it.
+
+    With an `archive` the files are added to the tar or zip file instead, in the
+    order of the calls: the writer threads are not used.
+
+    With a `manifest` the files created, modified or removed by the build are listed
+    with their sha256 in a json file by `close`. The unchanged files are left
+    untouched and not listed, as with `skip_unchanged`. The files of the output are
+    kept in `<manifest>.files`: the files of the previous build the new one doesn't
+    write nor keep, e.g. the pages of the deleted notes, are removed and listed.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        writers: int = 0,
+        queue_size: int = 64,
+        skip_unchanged: bool = False,
+        archive: str | None = None,
+        manifest: str | None = None,
+    ):
+        if manifest is not None and archive is not None:
+            raise ValueError(
+                "The manifest lists the changes of a directory, not an archive"
+            )
+        self.root = root
+        self.skip_unchanged = skip_unchanged or manifest is not None
+        self.manifest = manifest
+        # path -> ("created" | "modified" | "deleted", sha256), for the manifest
+        self.changes: dict[str, tuple[str, str | None]] = {}
+        self.outputs: set[str] = set()  # the files written or kept by the build
+        self.unchanged = 0
+        self.archive = Archive(archive) if archive is not None else None
+        self.digest: str | None = None  # of the archive, once closed
+        if self.archive is not None:
+            writers = 0
+        self._dirs: set[str] = set()
+        self._errors: list[Exception] = []
+        self._queue: queue.Queue | None = None
+        self._threads: list[threading.Thread] = []
+
+        if writers > 0:
+            self._queue = queue.Queue(maxsize=queue_size)
+            for _ in range(writers):
+                thread = threading.Thread(target=self._drain, daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def path(self, path: str) -> str:
+        """The location in the filesystem of a path relative to the output."""
+        return os.path.join(self.root, path)
+
+    def exists(self, path: str) -> bool:
+        """The file is already in the output, never for a new archive."""
+        return self.archive is None and os.path.exists(self.path(path))
+
+    def unchanged_contents(self, path: str, data: bytes) -> bool:
+        """The file is already in the output with the same bytes."""
+        return self.archive is None and self._same_contents(self.path(path), data)
+
+    def keep(self, path: str):
+        """The file of a previous build, not written again, is still part of the
+        output: it is not removed by `close`."""
+        self.outputs.add(path.replace(os.sep, "/"))
+
+    def write(self, path: str, data: bytes):
+        """Writes the data in the path, relative to the output directory."""
+        self.keep(path)
+        self._submit(self._write, path, data)
+
+    def copy(self, path: str, source: str):
+        """Copies the source file in the path, relative to the output directory."""
+        self.keep(path)
+        self._submit(self._copy, path, source)
+
+    def remove(self, path: str):
+        """Removes the file from the output, if it is there."""
+        self._submit(self._remove, path)
+
+    def close(self, prune: bool = True):
+        """Waits for the queued writes, raising the first error of the writers.
+
+        With a manifest and `prune`, removes the files of the previous build that
+        were not written nor kept."""
+        if self._queue is not None:
+            for _ in self._threads:
+                self._queue.put(None)
+            for thread in self._threads:
+                thread.join()
+            self._queue = None
+            self._threads = []
+        self._raise_errors()
+        if self.archive is not None:
+            self.digest = self.archive.close()
+            self.archive = None
+        if self.manifest is not None:
+            for path in self._previous_outputs():
+                if path in self.outputs:
+                    continue
+                if prune:
+                    self._remove(path)
+                else:  # removed by the next build
+                    self.outputs.add(path)
+            self._write_manifest()
+
+    def _submit(self, function, *args):
+        self._raise_errors()
+        if self._queue is None:
+            function(*args)
+        else:
+            self._queue.put((function, args))
+
+    def _raise_errors(self):
+        if self._errors:
+            raise self._errors[0]
+
+    def _drain(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            function, args = job
+            try:
+                function(*args)
+            except Exception as e:
+                self._errors.append(e)
+
+    def _makedirs(self, path: str):
+        # Every directory is created once per build
+        dirname = os.path.dirname(path)
+        if dirname not in self._dirs:
+            os.makedirs(dirname, exist_ok=True)
+            self._dirs.add(dirname)
+
+    def _write(self, path: str, data: bytes):
+        if self.archive is not None:
+            self.archive.add(path, data)
+            return
+        end_path = self.path(path)
+        if self.skip_unchanged and self._same_contents(end_path, data):
+            self.unchanged += 1
+            return
+        existed = self.manifest is not None and os.path.exists(end_path)
+        self._makedirs(end_path)
+        with open(end_path, "wb") as f:
+            f.write(data)
+        if self.manifest is not None:
+            self._record(path, existed, hashlib.sha256(data).hexdigest())
+
+    def _copy(self, path: str, source: str):
+        if self.archive is not None:
+            with open(source, "rb") as f:
+                self.archive.add(path, f.read())
+            return
+        end_path = self.path(path)
+        if self.skip_unchanged and os.path.exists(end_path):
+            if filecmp.cmp(source, end_path, shallow=False):
+                self.unchanged += 1
+                return
+        existed = self.manifest is not None and os.path.exists(end_path)
+        self._makedirs(end_path)
+        shutil.copyfile(source, end_path)
+        if self.manifest is not None:
+            with open(end_path, "rb") as f:
+                self._record(
+                    path, existed, hashlib.file_digest(f, "sha256").hexdigest()
+                )
+
+    def _remove(self, path: str):
+        if self.archive is not None:  # a new archive has only the written files
+            return
+        self.outputs.discard(path.replace(os.sep, "/"))
+        try:
+            os.remove(self.path(path))
+        except FileNotFoundError:
+            return
+        if self.manifest is not None:
+            self._record(path, True, None)
+
+    def _record(self, path: str, existed: bool, digest: str | None):
+        """Records the change of the file, its digest is None once removed."""
+        path = path.replace(os.sep, "/")
+        previous = self.changes.get(path, ("modified",) if existed else None)
+        if previous is None or previous[0] == "created":
+            if digest is None:  # created and removed by the same build
+                self.changes.pop(path, None)
+            else:
+                self.changes[path] = ("created", digest)
+        else:
+            self.changes[path] = ("modified" if digest else "deleted", digest)
+
+    def _write_manifest(self):
+        manifest = {"created": {}, "modified": {}, "deleted": []}
+        for path, (change, digest) in sorted(self.changes.items()):
+            if change == "deleted":
+                manifest["deleted"].append(path)
+            else:
+                manifest[change][path] = digest
+        os.makedirs(os.path.dirname(os.path.abspath(self.manifest)), exist_ok=True)
+        with open(self.manifest, "w") as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+        with open(self.manifest + ".files", "w") as f:
+            f.writelines(f"{path}\n" for path in sorted(self.outputs))
+
+    def _previous_outputs(self) -> list[str]:
+        """The files of the output written or kept by the previous build."""
+        try:
+            with open(self.manifest + ".files", "r") as f:
+                return f.read().splitlines()
+        except FileNotFoundError:
+            return []
+
+    @staticmethod
+    def _same_contents(path: str, data: bytes) -> bool:
+        try:
+            if os.path.getsize(path) != len(data):
+                return False
+            with open(path, "rb") as f:
+                return f.read() == data
+        except FileNotFoundError:
+            return False
@@ -0,0 +1,143 @@
+"""Timings of the stages of a build."""
+
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Iterable, Iterator, TypeVar
+
+try:
+    import resource
+except ImportError:  # not available on windows
+    resource = None
+
+T = TypeVar("T")
+MIB = 1024 * 1024
+
+
+def peak_rss() -> int | None:
+    """The peak resident memory of the process in bytes, None when it's unknown."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on linux, bytes on macos
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class Report:
+    """Time spent and number of calls for every stage of the build, and counters.
+
+    With `trace_memory`, and tracemalloc tracing, the memory still allocated at the
+    end of every stage and the peak reached during it are recorded too.
+    """
+
+    def __init__(self, trace_memory: bool = False):
+        self.stages: dict[str, dict] = {}
+        self.counters: dict[str, int] = {}
+        self.errors: list[dict] = []  # the notes that failed in a resilient build
+        self.trace_memory = trace_memory
+        self.memory: dict[str, dict] = {}  # stage -> {"allocated", "peak"} in bytes
+        self.peak_rss: int | None = None
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            with self.measure(name):
+                yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    @contextmanager
+    def measure(self, name: str):
+        """Records the memory allocated by the stage, when tracing."""
+        if not self.trace_memory or not tracemalloc.is_tracing():
+            yield
+            return
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        try:
+            yield
+        finally:
+            after, peak = tracemalloc.get_traced_memory()
+            memory = self.memory.setdefault(name, {"allocated": 0, "peak": 0})
+            memory["allocated"] += after - before
+            memory["peak"] = max(memory["peak"], peak - before)
+
+    def timed(self, name: str, iterable: Iterable[T]) -> Iterator[T]:
+        """Adds the time spent waiting for every item to the stage."""
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            self.add(name, time.perf_counter() - start)
+            yield item
+
+    def add(self, name: str, seconds: float, calls: int = 1):
+        stage = self.stages.setdefault(name, {"calls": 0, "seconds": 0.0})
+        stage["calls"] += calls
+        stage["seconds"] += seconds
+
+    def skip(self, name: str):
+        """Counts a call of the stage skipped by its prefilter."""
+        stage = self.stages.setdefault(name, {"calls": 0, "seconds": 0.0})
+        stage["skipped"] = stage.get("skipped", 0) + 1
+
+    def error(self, filename: str, name: str, error: Exception):
+        """Records a note that failed in the stage."""
+        self.errors.append(
+            {
+                "file": filename,
+                "stage": name,
+                "error": f"{type(error).__name__}: {error}",
+            }
+        )
+
+    def count(self, name: str, value: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def to_dict(self) -> dict:
+        return {
+            "stages": self.stages,
+            "counters": self.counters,
+            "errors": self.errors,
+            "memory": self.memory,
+            "peak_rss": self.peak_rss,
+        }
+
+    def print(self):
+        print("Timings:")
+        width = max((len(name) for name in self.stages), default=0)
+        for name, stage in self.stages.items():
+            line = (
+                f"  {name:<{width}} {stage['seconds']:9.3f}s {stage['calls']:7d} calls"
+            )
+            if "skipped" in stage:
+                line += f" {stage['skipped']:7d} skipped"
+            print(line)
+        for name, value in self.counters.items():
+            print(f"  {name}: {value}")
+
+        if self.memory:
+            print("Memory:")
+            width = max(len(name) for name in self.memory)
+            for name, memory in self.memory.items():
+                print(
+                    f"  {name:<{width}} {memory['allocated'] / MIB:+9.1f} MiB allocated"
+                    f" {memory['peak'] / MIB:9.1f} MiB peak"
+                )
+        if self.peak_rss is not None:
+            print(f"Peak RSS: {self.peak_rss / MIB:.1f} MiB")
+
+        if self.errors:
+            print(f"Errors: {len(self.errors)} notes failed")
+            by_stage: dict[str, list[dict]] = {}
+            for error in self.errors:
+                by_stage.setdefault(error["stage"], []).append(error)
+            for name, errors in by_stage.items():
+                print(f"  {name}: {len(errors)} notes")
+                for error in errors:
+                    print(f"    {error['file']}: {error['error']}")
@@ -0,0 +1,78 @@
+"""Slugs, output paths and urls of the notes, computed once per build."""
+
+import os
+from typing import NamedTuple
+
+from obsidown import utils
+from obsidown.config import Destination
+
+
+class Route(NamedTuple):
+    slug: str
+    output_path: str  # relative to output.filesystem
+    url: str
+
+
+class RouteTable:
+    """Maps every note of the vault to its route.
+
+    The notes are indexed by filename and by the name used in the links. Two notes with
+    the same output path or url raise an error before any file is processed.
+    """
+
+    def __init__(self, output: Destination, files: list[str]):
+        self.base = "/" + output.base
+        self.by_file: dict[str, Route] = {}
+        self.by_name: dict[str, Route] = {}
+        self._slugs: dict[str, str] = {}
+
+        output_paths: dict[str, list[str]] = {}
+        urls: dict[str, list[str]] = {}
+        for file in files:
+            name = note_name(file)
+            slug = utils.to_kebab_case(name)
+            route = Route(
+                slug=slug,
+                output_path=os.path.join(output.path, os.path.basename(file)),
+                url=self.base + "/" + slug,
+            )
+            self.by_file[file] = route
+            self.by_name.setdefault(name, route)
+            output_paths.setdefault(route.output_path, []).append(file)
+            urls.setdefault(route.url, []).append(file)
+
+        collisions = [
+            f"{key}: {', '.join(files)}"
+            for key, files in list(output_paths.items()) + list(urls.items())
+            if len(files) > 1
+        ]
+        if collisions:
+            raise ValueError(
+                "Notes with the same output path or url:\n" + "\n".join(collisions)
+            )
+
+    def route(self, filename: str) -> Route:
+        return self.by_file[filename]
+
+    def url(self, name: str) -> str:
+        """The url of the note with this name, as written in the links."""
+        return self.base + "/" + self.slug(name)
+
+    def slug(self, target: str) -> str:
+        """The slug of a link target, e.g. `Note#Heading`, also for unknown notes."""
+        slug = self._slugs.get(target)
+        if slug is None:
+            name, hashtag, heading = target.partition("#")
+            route = self.by_name.get(name)
+            slug = route.slug if route is not None else utils.to_kebab_case(name)
+            slug += hashtag + utils.to_kebab_case(heading)
+            self._slugs[target] = slug
+        return slug
+
+
+def note_name(path: str) -> str:
+    """Returns the name used by obsidian links to refer to the file."""
+    name = os.path.basename(path)
+    if name.endswith(".md"):
+        name = name[:-3]
+    return name
@@ -0,0 +1,109 @@
+"""Long running server keeping the configs and the parsed vault between builds.
+
+Builds are triggered with `POST /build`, optionally restricted to some configs with
+`?config=config.yaml`, and return the timings of every stage as json. Requests are
+served one at a time, so two builds never run together.
+"""
+
+import json
+import os
+import traceback
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from obsidown.config import Config
+from obsidown.main import build_many, load_config, open_loader
+
+
+class Site:
+    """A config file, parsed again only when it changes."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.mtime: int | None = None
+        self.config: Config | None = None
+
+    def get_config(self) -> Config:
+        mtime = os.stat(self.path).st_mtime_ns
+        if mtime != self.mtime:
+            print(f"reading the config {self.path}")
+            self.config = load_config(self.path)
+            if self.config.sources.rev is not None:
+                # The loader of the server reads the working tree
+                print(
+                    f"{self.path}: building the working tree, not {self.config.sources.rev}"
+                )
+                self.config.sources.rev = None
+            if self.config.build.streaming:
+                # The loader of the server keeps the notes between builds
+                print(f"{self.path}: keeping the notes in memory, not streaming")
+                self.config.build.streaming = False
+            self.mtime = mtime
+        return self.config
+
+
+class BuildServer(HTTPServer):
+    def __init__(self, address: tuple[str, int], configs: list[str]):
+        super().__init__(address, BuildHandler)
+        self.sites = {path: Site(path) for path in configs}
+        # The notes are shared between the configs, they are never modified in place.
+        # They are not cut by the loader, every build cuts them at its own markers
+        self.loader = open_loader(self.sites[configs[0]].get_config(), cut=())
+
+    def build(self, names: list[str]) -> dict:
+        configs = [self.sites[name].get_config() for name in names]
+        reports = build_many(configs, self.loader)
+        return {name: report.to_dict() for name, report in zip(names, reports)}
+
+    def server_close(self):
+        super().server_close()
+        self.loader.close()
+
+
+class BuildHandler(BaseHTTPRequestHandler):
+    server: BuildServer
+
+    def do_GET(self):
+        if urlparse(self.path).path == "/configs":
+            self._respond(200, {"configs": list(self.server.sites)})
+        else:
+            self._respond(404, {"error": f"Unknown path {self.path}"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/build":
+            self._respond(404, {"error": f"Unknown path {self.path}"})
+            return
+
+        names = parse_qs(url.query).get("config", list(self.server.sites))
+        unknown = [name for name in names if name not in self.server.sites]
+        if unknown:
+            self._respond(404, {"error": f"Unknown configs {unknown}"})
+            return
+
+        try:
+            results = self.server.build(names)
+        except Exception as e:
+            traceback.print_exc()
+            self._respond(500, {"error": repr(e)})
+            return
+        self._respond(200, results)
+
+    def _respond(self, status: int, body: dict):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def serve(configs: list[str], host: str = "127.0.0.1", port: int = 8765):
+    server = BuildServer((host, port), configs)
+    print(f"Serving builds of {', '.join(configs)} on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
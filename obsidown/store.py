@@ -0,0 +1,161 @@
+"""SQLite store of the parsed notes, kept between runs."""
+
+import datetime
+import os
+import pickle
+import sqlite3
+import threading
+
+from obsidown.operations.base import MdFile
+from obsidown.routes import note_name
+
+# Bumped when the schema, MdFile or the parsing of the notes change: the notes
+# stored by another version are dropped
+FORMAT_VERSION = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS notes (
+    path TEXT PRIMARY KEY,
+    signature TEXT NOT NULL,  -- modification time and size, the blob id with --rev
+    head TEXT NOT NULL,  -- commit checked out when last_commit_time was read
+    title TEXT NOT NULL,
+    last_commit_time TEXT,  -- iso format, in utc when the time has a timezone
+    note BLOB NOT NULL  -- the pickled MdFile
+);
+CREATE TABLE IF NOT EXISTS tags (path TEXT NOT NULL, tag TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS tags_tag ON tags (tag);
+CREATE INDEX IF NOT EXISTS tags_path ON tags (path);
+CREATE TABLE IF NOT EXISTS links (path TEXT NOT NULL, target TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS links_target ON links (target);
+CREATE INDEX IF NOT EXISTS links_path ON links (path);
+"""
+
+
+class MetadataStore:
+    """The parsed notes by path, reused while the file doesn't change, so the next
+    runs parse only the changed files. The `head` checked out when a note was stored
+    tells whether its commit time has to be read again.
+
+    The title, tags, links and commit time of the notes are also kept in their own
+    columns, to query the whole vault without reading it. The writes are committed by
+    `commit`, the store can be used by several threads. A store written by another
+    `FORMAT_VERSION` is emptied when opened.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        (version,) = self._db.execute("PRAGMA user_version").fetchone()
+        if version != FORMAT_VERSION:
+            self._db.executescript(
+                "DROP TABLE IF EXISTS notes; DROP TABLE IF EXISTS tags;"
+                " DROP TABLE IF EXISTS links;"
+            )
+        self._db.executescript(SCHEMA)
+        self._db.execute(f"PRAGMA user_version = {FORMAT_VERSION}")
+        self._db.commit()
+        self._lock = threading.Lock()
+
+    def get(self, path: str, signature: str) -> tuple[MdFile, str] | None:
+        """The stored note with the signature and the head it was stored at."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT note, head FROM notes WHERE path = ? AND signature = ?",
+                (path, signature),
+            ).fetchone()
+        if row is None:
+            return None
+        try:
+            return pickle.loads(row[0]), row[1]
+        except Exception:  # e.g. a class changed without bumping FORMAT_VERSION
+            return None
+
+    def put(self, md_file: MdFile, signature: str, head: str):
+        path = md_file.filename
+        metadata = md_file.metadata
+        last_commit_time = metadata.get("last_commit_time")
+        if last_commit_time is not None and last_commit_time.tzinfo is not None:
+            last_commit_time = last_commit_time.astimezone(datetime.timezone.utc)
+        tags = metadata.get("tags") or []
+        if isinstance(tags, str):
+            tags = [tags]
+        targets = {ref.split("|")[0].split("#")[0] for ref in md_file.references}
+
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO notes VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    path,
+                    signature,
+                    head,
+                    str(metadata.get("title", note_name(path))),
+                    last_commit_time.isoformat() if last_commit_time else None,
+                    pickle.dumps(md_file),
+                ),
+            )
+            self._db.execute("DELETE FROM tags WHERE path = ?", (path,))
+            self._db.executemany(
+                "INSERT INTO tags VALUES (?, ?)", [(path, str(tag)) for tag in tags]
+            )
+            self._db.execute("DELETE FROM links WHERE path = ?", (path,))
+            self._db.executemany(
+                "INSERT INTO links VALUES (?, ?)",
+                [(path, target) for target in sorted(targets)],
+            )
+
+    def retain(self, directory: str, paths: list[str]):
+        """Drops the notes of the directory that are not in the paths any more."""
+        prefix = os.path.join(directory, "")
+        keep = set(paths)
+        with self._lock:
+            stale = [
+                (path,)
+                for (path,) in self._db.execute("SELECT path FROM notes")
+                if path.startswith(prefix) and path not in keep
+            ]
+            for table in ("notes", "tags", "links"):
+                self._db.executemany(f"DELETE FROM {table} WHERE path = ?", stale)
+
+    def commit(self):
+        with self._lock:
+            self._db.commit()
+
+    def close(self):
+        self.commit()
+        self._db.close()
+
+    def latest(self, limit: int) -> list[tuple[str, str, str]]:
+        """The (path, title, last commit time) of the most recently committed notes."""
+        with self._lock:
+            return self._db.execute(
+                "SELECT path, title, last_commit_time FROM notes"
+                " WHERE last_commit_time IS NOT NULL"
+                " ORDER BY last_commit_time DESC, path LIMIT ?",
+                (limit,),
+            ).fetchall()
+
+    def tags(self) -> dict[str, int]:
+        """The number of notes with every tag."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT tag, COUNT(*) FROM tags GROUP BY tag ORDER BY tag"
+            ).fetchall()
+        return dict(rows)
+
+    def tagged(self, tag: str) -> list[tuple[str, str]]:
+        """The (path, title) of the notes with the tag."""
+        with self._lock:
+            return self._db.execute(
+                "SELECT notes.path, notes.title FROM tags JOIN notes USING (path)"
+                " WHERE tag = ? ORDER BY notes.path",
+                (tag,),
+            ).fetchall()
+
+    def linking_to(self, name: str) -> list[str]:
+        """The paths of the notes linking to the note with the name."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT path FROM links WHERE target = ? ORDER BY path", (name,)
+            ).fetchall()
+        return [path for (path,) in rows]
@@ -2,6 +2,43 @@ import re
 from datetime import datetime, timedelta, timezone
 from urllib.parse import urljoin
 
+# Placeholders of the protected code, from the unicode private use area
+CODE_START, CODE_END = "\ue000", "\ue001"
+
+# Fenced code blocks (closed by the same fence, or the end of the page) and inline code
+CODE_PATTERN = re.compile(
+    r"^[ \t]*(`{3,}|~{3,})[^\n]*\n.*?(?:^[ \t]*\1[ \t]*$|\Z)|``[^\n]+?``|`[^`\n]+`",
+    flags=re.MULTILINE | re.DOTALL,
+)
+
+
+def protect_code(page: str) -> tuple[str, list[str]]:
+    """Replace the code in the page with placeholders, so the transforms of the text
+    can't touch the `$`, `[[` or urls written in the code.
+
+    Example
+    -------
+    >>> protect_code("a `[[b]]` c")
+    ("a \ue0000\ue001 c", ["`[[b]]`"])
+    """
+    protected = []
+
+    def replace(match):
+        protected.append(match.group(0))
+        return f"{CODE_START}{len(protected) - 1}{CODE_END}"
+
+    return CODE_PATTERN.sub(replace, page), protected
+
+
+def restore_code(page: str, protected: list[str]) -> str:
+    """Put back the code replaced by `protect_code`."""
+    if not protected:
+        return page
+    return re.sub(
+        CODE_START + r"([0-9]+)" + CODE_END, lambda x: protected[int(x.group(1))], page
+    )
+
+
 def interpolate_weight(dt: datetime) -> float:
     """Interpolates a weight for a given datetime between 2022 and 2030, considering full time granularity."""
     # Define start and end times
@@ -122,6 +159,50 @@ def convert_images(page: str, base: str = ""):
     return page
 
 
+def rewrite_image_sources(page: str, base: str, names: dict[str, str]):
+    """Point the html image tags generated by `convert_images` to the renamed images.
+
+    Example
+    -------
+    >>> rewrite_image_sources('<img src="/img/a.png">', "/img", {"a.png": "f00.png"})
+    '<img src="/img/f00.png">'
+    """
+
+    def replace(match):
+        image = match.group(1)
+        return 'src="' + base + "/" + names.get(image, image) + '"'
+
+    return re.sub(r'src="' + re.escape(base) + r'/([^"]+)"', replace, page)
+
+
+def convert_responsive_images(page: str, base: str, webp: bool = True):
+    """Point the html image tags with a width to the resized copy of the image.
+    With `webp` the tag is wrapped in a picture tag with the webp copy as alternative.
+
+    Example
+    -------
+    >>> convert_responsive_images('<img src="/img/a.png" width="300" alt="a"/>', "/img", False)
+    '<img src="/img/a-300w.png" width="300" alt="a"/>'
+    """
+
+    def replace(match):
+        name, extension, width, rest = match.groups()
+        img = f'<img src="{base}/{name}-{width}w{extension}" width="{width}"{rest}>'
+        if not webp:
+            return img
+        return (
+            f'<picture><source srcset="{base}/{name}-{width}w.webp" type="image/webp">'
+            + img
+            + "</picture>"
+        )
+
+    pattern = (
+        r'<img src="' + re.escape(base) + r'/([^"]+?)(\.[A-Za-z]+)"'
+        r' width="\s*([0-9]+)[^"]*"([^>]*)>'
+    )
+    return re.sub(pattern, replace, page)
+
+
 def convert_external_links(page: str):
     """If there is an external link without the markdown format, convert it to the markdown format.
 
@@ -135,15 +216,28 @@ def convert_external_links(page: str):
 
     # Questo regex è un po' fragile, ma è difficile da fare, dovresti avere lookahead infinito!
     return re.sub(
-        r"(?<!\[)(https?:\/\/[^\s\]\(\)]+)(?!(\)|[a-z]|\.|[0-9]|[A-Z]|\/|_|,|-|=|\?|&|~|#|%|:))",
+        r"(?<!\[)(https?:\/\/[^\s\]\(\)\ue000]+)(?!(\)|[a-z]|\.|[0-9]|[A-Z]|\/|_|,|-|=|\?|&|~|#|%|:))",
         r"[\1](\1)",
         page,
     )
 
 
-def convert_links(page: str, base: str = ""):  #
+def extract_urls(page: str) -> list[str]:
+    """Extract the external urls of the page, bare or in markdown links.
+
+    Example
+    -------
+    >>> extract_urls("See https://a.com/x. and [b](https://b.com)")
+    ["https://a.com/x", "https://b.com"]
+    """
+    urls = re.findall(r"https?://[^\s\]\(\)<>\"'\ue000]+", page)
+    return [url.rstrip(".,;:!?") for url in urls]
+
+
+def convert_links(page: str, base: str = "", slug=None):  #
     """Convert the links to the markdown format.
     # Warning: this assumes images to be links to!
+    `slug` turns the link target into the url path, by default `to_kebab_case`.
 
     Example
     -------
@@ -151,12 +245,14 @@ def convert_links(page: str, base: str = ""):  #
     "hello <a href="https://google.com/world">{world}</a>"
     """
     # first convert hashtag links
+    if slug is None:
+        slug = to_kebab_case
 
     def convert_to_md(x):
-        return "[{}]({})".format(x, to_kebab_case(x))
+        return "[{}]({})".format(x, slug(x))
 
     def convert_two_to_md(x, y):
-        return "[{}]({})".format(y, to_kebab_case(x))
+        return "[{}]({})".format(y, slug(x))
 
     page = re.sub(
         r"\[\[(#[^\]]+?)\|([^\]]+)\]\]",
@@ -167,10 +263,10 @@ def convert_links(page: str, base: str = ""):  #
 
     # then outer links
     def convert_to_md2(x):
-        return "[{}]({}/{})".format(x, base, to_kebab_case(x))
+        return "[{}]({}/{})".format(x, base, slug(x))
 
     def convert_two_to_md2(x, y):
-        return "[{}]({}/{})".format(y, base, to_kebab_case(x))
+        return "[{}]({}/{})".format(y, base, slug(x))
 
     page = re.sub(
         r"\[\[([^\]]+?)\|([^\]]+)\]\]",
@@ -210,6 +306,74 @@ def extract_links(page: str):
     return re.findall(r"\[\[([^\]]+?)\]\]", page)
 
 
+# `![[Note]]`, `![[Note#Heading]]` or `![[Note#Heading|alias]]`
+EMBED_PATTERN = re.compile(r"!\[\[([^\]|#]+)(?:#([^\]|]+))?(?:\|[^\]]*)?\]\]")
+
+
+def extract_embeds(page: str) -> list[tuple[str, str | None]]:
+    """Extract the notes embedded in the page, with the embedded heading if any.
+
+    Example
+    -------
+    >>> extract_embeds("![[Note#Intro]] and ![[pic.png]]")
+    [("Note", "Intro")]
+    """
+    return [
+        (match.group(1).strip(), match.group(2))
+        for match in EMBED_PATTERN.finditer(page)
+        if not is_image(match.group(1).strip())
+    ]
+
+
+def extract_section(page: str, heading: str) -> str:
+    """The lines under the heading, up to the next heading of the same level or higher.
+
+    Example
+    -------
+    >>> extract_section("# A\na\n## B\nb\n# C\nc", "B")
+    "## B\nb"
+    """
+    lines = page.split("\n")
+    for start, line in enumerate(lines):
+        match = re.match(r"(#{1,6})\s+(.*?)\s*$", line)
+        if match is not None and match.group(2) == heading:
+            level = len(match.group(1))
+            break
+    else:
+        return ""
+
+    end = len(lines)
+    for i in range(start + 1, len(lines)):
+        match = re.match(r"(#{1,6})\s", lines[i])
+        if match is not None and len(match.group(1)) <= level:
+            end = i
+            break
+    return "\n".join(lines[start:end]).strip()
+
+
+def tokenize(page: str) -> list[str]:
+    """Split the text of the page in lowercase words for the search index.
+
+    Example
+    -------
+    >>> tokenize('See <a href="/notes/x">the Note</a>, [here](https://x.com)!')
+    ['see', 'the', 'note', 'here']
+    """
+    page = re.sub(r"<[^>]+>", " ", page)  # html tags
+    page = re.sub(r"\]\([^\)]*\)", " ", page)  # targets of markdown links
+    return [word for word in re.findall(r"\w+", page.lower()) if len(word) > 1]
+
+
+def delta_encode(values: list[int]) -> list[int]:
+    """Replace every value of a sorted list with its difference from the previous one."""
+    previous = 0
+    result = []
+    for value in values:
+        result.append(value - previous)
+        previous = value
+    return result
+
+
 def is_image(name: str):
     """Check if a file is an image."""
     return (
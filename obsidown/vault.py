@@ -0,0 +1,105 @@
+"""Index of the notes and images of the vault, filled while the files are loaded."""
+
+import datetime
+import re
+from typing import Iterable, Iterator
+
+from obsidown import utils
+from obsidown.graph import LinkGraph
+from obsidown.images import ImageStore
+from obsidown.operations.base import MdFile
+from obsidown.routes import RouteTable, note_name
+
+
+class Vault:
+    def __init__(
+        self,
+        files: list[str],
+        images: list[str],
+        image_store: ImageStore,
+        routes: RouteTable,
+        keep_notes: bool = True,
+    ):
+        self.files = files
+        self.images = images
+        self.image_store = image_store
+        self.routes = routes
+        # Without it only the indexes are kept, the notes are released after the pipeline
+        self.keep_notes = keep_notes
+        self.notes: list[MdFile] = []
+        self.by_name: dict[
+            str, MdFile
+        ] = {}  # the loaded notes, by the name in the links
+        # update_frontmatter drops it from the metadata, the feed needs it later
+        self.commit_times: dict[str, datetime.datetime] = {}
+        self.image_refs: set[str] = set()
+        self.image_widths: dict[str, set[int]] = {}  # widths used in `![[img|300]]`
+
+        # The ids of the nodes follow the order of the files
+        self.graph = LinkGraph(note_name(file) for file in files)
+
+    def add(self, md_file: MdFile):
+        """Registers the references of a loaded file in the indexes."""
+        if self.keep_notes:
+            self.notes.append(md_file)
+            self.by_name.setdefault(note_name(md_file.filename), md_file)
+        if "last_commit_time" in md_file.metadata:
+            self.commit_times[md_file.filename] = md_file.metadata["last_commit_time"]
+        source = self.graph.id(note_name(md_file.filename))
+
+        for ref in md_file.references:
+            ref, *alias = ref.split("|")  # don't want the aliases!
+            if utils.is_image(ref):
+                self.image_refs.add(ref)
+                # Only the size syntax of obsidian, `300` or `300x200`, not a caption
+                width = (
+                    re.fullmatch(r"\s*(\d+)(?:x\d+)?\s*", alias[0]) if alias else None
+                )
+                if width is not None:
+                    self.image_widths.setdefault(ref, set()).add(int(width.group(1)))
+                continue
+
+            target = self.graph.id(note_name(ref.split("#")[0]))
+            if source is not None and target is not None and target != source:
+                self.graph.add_edge(source, target)
+
+    def register(self, notes: Iterable[MdFile]) -> Iterator[MdFile]:
+        """Adds the notes to the indexes as they are loaded."""
+        for md_file in notes:
+            self.add(md_file)
+            yield md_file
+
+    def embedded(self, md_file: MdFile) -> list[MdFile]:
+        """The loaded notes embedded in the file, also through other embedded notes."""
+        result = []
+        seen = {md_file.filename}
+        pending = [md_file]
+        while pending:
+            for name, _ in utils.extract_embeds(pending.pop().contents):
+                note = self.by_name.get(name)
+                if note is not None and note.filename not in seen:
+                    seen.add(note.filename)
+                    result.append(note)
+                    pending.append(note)
+        return result
+
+    def not_cited_refs(self, md_file: MdFile) -> set[str]:
+        """The references that will not be present in the final files."""
+        not_cited_refs = set()
+        for ref in md_file.references:
+            ref = ref.split("|")[0]
+            if utils.is_image(ref):
+                continue
+
+            # here is image ref, we should count only the first part
+            ref = ref.split("#")[0]
+            found = False
+            for f in self.files:
+                if ref in f:
+                    found = True
+                    break
+
+            if not found:
+                not_cited_refs.add(ref)
+
+        return not_cited_refs
@@ -0,0 +1,43 @@
+import pytest
+
+from obsidown.config import Config
+from obsidown.images import ImageStore
+from obsidown.routes import RouteTable
+from obsidown.vault import Vault
+
+
+@pytest.fixture
+def site(tmp_path):
+    """The output directory of the builds."""
+    return tmp_path / "site"
+
+
+@pytest.fixture
+def make_config(site, tmp_path):
+    """Makes a config writing in `site`, without sources nor pipeline by default.
+    The operations keep their state in `tmp_path`."""
+
+    def make(**fields) -> Config:
+        fields.setdefault("sources", {"paths": [], "images": []})
+        fields.setdefault("pipeline", [])
+        fields["build"] = {"state": str(tmp_path / "state"), **fields.get("build", {})}
+        output = {
+            "base": "notes",
+            "path": "content",
+            "images": "images",
+            "images_path": "static/images",
+            "filesystem": str(site),
+        }
+        return Config(output=output, **fields)
+
+    return make
+
+
+@pytest.fixture
+def make_vault():
+    """Makes the vault of the notes of the files, without images."""
+
+    def make(config: Config, files: list[str]) -> Vault:
+        return Vault(files, [], ImageStore([]), RouteTable(config.output, files))
+
+    return make
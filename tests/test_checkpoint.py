@@ -0,0 +1,66 @@
+import os
+
+import pytest
+
+from obsidown.main import build
+
+BIB = """@article{key2020,
+  author = {Doe, John},
+  title = {A Title},
+  year = {2020},
+  url = {https://doi.org/x}
+}
+"""
+
+
+def test_resilient_build_resumes_failed_notes(tmp_path, site, make_config):
+    notes = tmp_path / "notes"
+    notes.mkdir()
+    (notes / "good.md").write_text("As said in [[@key2020]]")
+    (notes / "bad.md").write_text("As said in [[@missing]]")
+    (tmp_path / "refs.bib").write_text(BIB)
+    config = make_config(
+        sources={"paths": [str(notes)], "images": []},
+        pipeline=[
+            {
+                "name": "citation_convert",
+                "options": {"bibfile": str(tmp_path / "refs.bib")},
+            },
+            {"name": "write_file", "options": {}},
+        ],
+        build={"resilient": True, "checkpoint": str(tmp_path / "checkpoint.jsonl")},
+    )
+
+    report = build(config)
+    assert [error["file"] for error in report.errors] == [str(notes / "bad.md")]
+    assert report.errors[0]["stage"] == "0:citation_convert"
+    assert os.path.exists(site / "content" / "good.md")
+    assert os.path.exists(config.build.checkpoint)
+
+    (notes / "bad.md").write_text("Fixed [[@key2020]]")
+    report = build(config, resume=True)
+    assert report.errors == []
+    assert report.counters["notes resumed"] == 1
+    assert report.stages["1:write_file"]["calls"] == 1
+    assert os.path.exists(site / "content" / "bad.md")
+    assert not os.path.exists(config.build.checkpoint)
+
+
+@pytest.mark.parametrize("prefetch", [0, 2])
+def test_resilient_build_skips_unreadable_notes(tmp_path, site, make_config, prefetch):
+    notes = tmp_path / "notes"
+    notes.mkdir()
+    (notes / "good.md").write_text("---\ntitle: Good\n---\nText")
+    (notes / "bad.md").write_text("---\ntitle: [Bad\n---\nText")
+    config = make_config(
+        sources={"paths": [str(notes)], "images": []},
+        pipeline=[{"name": "write_file", "options": {}}],
+        build={"resilient": True, "prefetch": prefetch},
+    )
+
+    report = build(config)
+    assert [(error["file"], error["stage"]) for error in report.errors] == [
+        (str(notes / "bad.md"), "load")
+    ]
+    assert os.path.exists(site / "content" / "good.md")
+    assert not os.path.exists(site / "content" / "bad.md")
@@ -0,0 +1,56 @@
+import pytest
+
+from obsidown.operations.base import MdFile
+from obsidown.operations.embed import Embed
+from obsidown.operations.regex_replace import RegexReplace
+from obsidown.operations.remove_after_string import RemoveAfterString
+
+
+@pytest.fixture
+def make_embed(make_config, make_vault):
+    def make(notes: dict[str, str]) -> tuple[Embed, dict[str, MdFile]]:
+        config = make_config()
+        vault = make_vault(config, [f"/vault/{name}.md" for name in notes])
+        loaded = {}
+        for name, contents in notes.items():
+            filename = f"/vault/{name}.md"
+            loaded[name] = MdFile(
+                metadata={}, contents=contents, references=[], filename=filename
+            )
+            vault.add(loaded[name])
+
+        embed = Embed(config, vault)
+        embed.setup([RemoveAfterString("%%"), embed])
+        return embed, loaded
+
+    return make
+
+
+def test_embed_notes_and_sections(make_embed):
+    embed, notes = make_embed(
+        {
+            "Host": "Intro\n![[Part]]\n![[Part#Second]]\n![[Missing]] ![[pic.png]]",
+            "Part": "# First\none [[Link]]\n# Second\ntwo ![[Leaf]]\n%% private",
+            "Leaf": "leaf",
+        }
+    )
+    result = embed(notes["Host"])
+    assert result.contents == (
+        "Intro\n# First\none [[Link]]\n# Second\ntwo leaf\n# Second\ntwo leaf\n"
+        "![[Missing]] ![[pic.png]]"
+    )
+    assert "Link" in result.references
+    assert ("/vault/Part.md", "Second") in embed.fragments
+    assert embed.fragments[("/vault/Part.md", "Second")][0] == "# Second\ntwo leaf"
+
+
+def test_embed_cycle(make_embed):
+    embed, notes = make_embed({"A": "![[B]]", "B": "![[A]]"})
+    with pytest.raises(ValueError, match="A.md -> /vault/B.md -> /vault/A.md"):
+        embed(notes["A"])
+
+
+def test_embed_refuses_stateful_operations(make_embed):
+    embed, _ = make_embed({"A": "a"})
+    with pytest.raises(ValueError, match="RegexReplace"):
+        embed.setup([RegexReplace([{"pattern": "a"}]), embed])
@@ -0,0 +1,59 @@
+import datetime
+import os
+import xml.etree.ElementTree as ET
+
+from obsidown.operations.base import MdFile
+from obsidown.operations.feed import ATOM_NS, Feed
+from obsidown.output import Output
+
+
+def test_feed_keeps_latest_notes(site, make_config, make_vault):
+    config = make_config()
+    files = [f"/vault/Note {i}.md" for i in range(5)]
+    vault = make_vault(config, files)
+
+    def run():
+        output = Output(str(site))
+        feed = Feed(config, vault, output, size=2, site="https://example.com")
+        for i, filename in enumerate(files):
+            time = datetime.datetime(
+                2024, 1, 1 + (i * 3) % 5, tzinfo=datetime.timezone.utc
+            )
+            metadata = {"last_commit_time": time}
+            feed(
+                MdFile(metadata=metadata, contents="", references=[], filename=filename)
+            )
+        feed.finalize()
+
+    run()
+    items = ET.parse(site / "index.xml").getroot().findall("channel/item")
+    # the days are 1, 4, 2, 5, 3: the newest are the notes 3 and 1
+    assert [item.find("link").text for item in items] == [
+        "https://example.com/notes/note-3",
+        "https://example.com/notes/note-1",
+    ]
+
+    os.utime(site / "index.xml", ns=(0, 0))
+    run()
+    assert os.stat(site / "index.xml").st_mtime_ns == 0
+
+
+def test_atom_feed_dates_are_in_utc(site, make_config, make_vault):
+    config = make_config()
+    files = ["/vault/Note.md"]
+    vault = make_vault(config, files)
+
+    def updated(metadata: dict | None) -> list[str]:
+        feed = Feed(config, vault, Output(str(site)), format="atom", path="feed.xml")
+        if metadata is not None:
+            feed(
+                MdFile(metadata=metadata, contents="", references=[], filename=files[0])
+            )
+        feed.finalize()
+        root = ET.parse(site / "feed.xml").getroot()
+        return [element.text for element in root.iter(f"{{{ATOM_NS}}}updated")]
+
+    assert updated(None) == ["1970-01-01T00:00:00+00:00"]
+    # a time without timezone is in utc, whatever the machine
+    time = datetime.datetime(2024, 1, 1, 12)
+    assert updated({"last_commit_time": time}) == ["2024-01-01T12:00:00+00:00"] * 2
@@ -0,0 +1,64 @@
+import subprocess
+
+import pytest
+
+from obsidown.config import SourcesList
+from obsidown.git_source import GitRevision, open_source
+from obsidown.loader import NoteLoader
+
+
+def git(cwd, *args):
+    subprocess.run(
+        ["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+        cwd=cwd,
+        check=True,
+        capture_output=True,
+    )
+
+
+def test_git_revision_reads_old_contents(tmp_path):
+    git(tmp_path, "init", "-q")
+    notes = tmp_path / "notes"
+    notes.mkdir()
+    note = notes / "note.md"
+    note.write_text("---\ntitle: Note\n---\nLinks to [[first]]")
+    (notes / "pic.png").write_bytes(b"png")
+    git(tmp_path, "add", ".")
+    git(tmp_path, "commit", "-q", "-m", "first")
+
+    note.write_text("---\ntitle: Note\n---\nLinks to [[second]]")
+    (notes / "new.md").write_text("new")
+    git(tmp_path, "add", ".")
+    git(tmp_path, "commit", "-q", "-m", "second")
+    note.unlink()
+
+    source = GitRevision(str(notes), "HEAD~1")
+    loader = NoteLoader(source)
+    try:
+        assert loader.list_files(str(notes)) == [str(note)]
+        assert loader.list_images(str(notes)) == [str(notes / "pic.png")]
+
+        md_file = loader.load(str(note))
+        assert md_file.references == ["first"]
+        assert md_file.metadata["title"] == "Note"
+        assert md_file.metadata["last_commit_time"] is not None
+        assert loader.load(str(note)) is md_file
+        assert source.read(str(notes / "pic.png")) == b"png"
+    finally:
+        loader.close()
+
+
+def test_open_source_needs_one_repository(tmp_path):
+    for name in ("notes", "images"):
+        (tmp_path / name).mkdir()
+        git(tmp_path / name, "init", "-q")
+        git(tmp_path / name, "commit", "-q", "--allow-empty", "-m", "first")
+
+    sources = SourcesList(
+        paths=[str(tmp_path / "notes")], images=[str(tmp_path / "images")], rev="HEAD"
+    )
+    with pytest.raises(ValueError, match="one git repository"):
+        open_source(sources)
+
+    sources.images = [str(tmp_path / "notes" / "img")]
+    open_source(sources).close()
@@ -0,0 +1,23 @@
+from obsidown.graph import LinkGraph
+
+
+def test_link_graph():
+    graph = LinkGraph(["a", "b", "c"])
+    assert graph.id("b") == 1
+    assert graph.id("missing") is None
+
+    graph.add_edge(0, 1)
+    graph.add_edge(0, 2)
+    graph.add_edge(2, 1)
+    graph.add_edge(0, 1)  # duplicated links count once
+
+    assert list(graph.links(0)) == [1, 2]
+    assert list(graph.links(1)) == []
+    assert list(graph.backlinks(1)) == [0, 2]
+    assert list(graph.edges()) == [(0, 1), (0, 2), (2, 1)]
+
+    # Adding nodes after a query invalidates the compressed arrays
+    d = graph.add_node("d")
+    graph.add_edge(d, 0)
+    assert list(graph.backlinks(0)) == [d]
+    assert list(graph.links(d)) == [0]
@@ -0,0 +1,65 @@
+import os
+
+import pytest
+
+from obsidown.images import ImageStore, derivative_name, make_derivatives
+from obsidown.operations.base import MdFile
+
+
+def test_image_store(tmp_path):
+    first = tmp_path / "Pasted image 1.png"
+    second = tmp_path / "Pasted image 2.png"
+    other = tmp_path / "other.png"
+    first.write_bytes(b"same")
+    second.write_bytes(b"same")
+    other.write_bytes(b"different")
+
+    cache = tmp_path / "cache" / "hashes.json"
+    store = ImageStore([str(first), str(second), str(other)], str(cache))
+    assert store.canonical_name("Pasted image 1.png") == store.canonical_name(
+        "Pasted image 2.png"
+    )
+    assert store.canonical_name("other.png") != store.canonical_name(
+        "Pasted image 1.png"
+    )
+    assert store.canonical_name("missing.png") is None
+
+    store.save_cache()
+    assert ImageStore([], str(cache)).hashes == store.hashes
+
+
+def test_derivative_name():
+    assert derivative_name("dir/pic.png", 300) == "dir/pic-300w.png"
+    assert derivative_name("dir/pic.png", 300, ".webp") == "dir/pic-300w.webp"
+
+
+def test_make_derivatives(tmp_path):
+    Image = pytest.importorskip("PIL.Image")
+    source = tmp_path / "pic.jpg"
+    Image.new("RGB", (600, 400)).save(source)
+
+    derivatives = make_derivatives(str(source), "abc", 300, str(tmp_path), True)
+    assert [os.path.basename(d) for d in derivatives] == [
+        "abc-300w.jpg",
+        "abc-300w.webp",
+    ]
+    with Image.open(derivatives[1]) as image:
+        assert image.size == (300, 200)
+
+    # Never upscales the image
+    (big,) = make_derivatives(str(source), "abc", 1000, str(tmp_path), False)
+    with Image.open(big) as image:
+        assert image.size == (600, 400)
+
+
+def test_vault_reads_the_widths_of_the_images(make_config, make_vault):
+    config = make_config()
+    vault = make_vault(config, ["/vault/Note.md"])
+    references = ["a.png|300", "b.png|2 cats", "c.png| 300x200 ", "d.png"]
+    vault.add(
+        MdFile(
+            metadata={}, contents="", references=references, filename="/vault/Note.md"
+        )
+    )
+    assert vault.image_refs == {"a.png", "b.png", "c.png", "d.png"}
+    assert vault.image_widths == {"a.png": {300}, "c.png": {300}}
@@ -0,0 +1,95 @@
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from obsidown.linkcheck import LinkChecker
+
+
+class Handler(BaseHTTPRequestHandler):
+    requests: list[str] = []
+
+    def do_HEAD(self):
+        self.requests.append(f"HEAD {self.path}")
+        if self.path == "/moved":
+            self.send_response(301)
+            self.send_header("Location", "/ok")
+        elif self.path == "/get-only":
+            self.send_response(405)
+        else:
+            self.send_response(200 if self.path == "/ok" else 404)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        self.requests.append(f"GET {self.path}")
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    Handler.requests = []
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_link_checker_caches_results(server, tmp_path):
+    cache = str(tmp_path / "links.json")
+    urls = [
+        f"{server}/ok",
+        f"{server}/missing",
+        f"{server}/moved",
+        f"{server}/get-only",
+    ]
+    checker = LinkChecker(cache, concurrency=2, delay=0, timeout=5)
+    results = checker.check(urls + [f"{server}/ok"])
+    checker.save_cache()
+
+    assert {url: result["status"] for url, result in results.items()} == {
+        f"{server}/ok": 200,
+        f"{server}/missing": 404,
+        f"{server}/moved": 200,
+        f"{server}/get-only": 200,
+    }
+    assert checker.requests == 4
+    assert "GET /get-only" in Handler.requests
+
+    checker = LinkChecker(cache, delay=0)
+    assert checker.check(urls)[f"{server}/missing"]["status"] == 404
+    assert checker.requests == 0
+
+    checker = LinkChecker(cache, ttl=0, delay=0)
+    checker.check([f"{server}/ok"])
+    assert checker.requests == 1
+
+
+def test_link_checker_unreachable(tmp_path):
+    checker = LinkChecker(delay=0, timeout=2)
+    (result,) = checker.check(["http://127.0.0.1:9/"]).values()
+    assert result["status"] is None
+    assert result["error"]
+
+    # the errors are kept for error_ttl only
+    checker.error_ttl = 0
+    checker.check(["http://127.0.0.1:9/"])
+    assert checker.requests == 2
+
+
+def test_link_checker_paces_hosts_without_slots(server):
+    port = server.rsplit(":", 1)[1]
+    slow = [f"http://127.0.0.1:{port}/slow{i}" for i in range(3)]
+    other = f"http://localhost:{port}/other"
+    checker = LinkChecker(concurrency=1, delay=0.3, timeout=5)
+    checker.check(slow + [other])
+
+    # the other host doesn't wait for the delays of the first one
+    assert Handler.requests.index("HEAD /other") < Handler.requests.index("HEAD /slow2")
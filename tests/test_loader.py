@@ -0,0 +1,91 @@
+import os
+
+from concurrent.futures import ThreadPoolExecutor
+
+from obsidown.loader import NoteLoader
+from obsidown.operations.base import MdFile, _find_repo
+from obsidown.operations.remove_after_string import RemoveAfterString
+from tests.test_git_source import git
+
+
+def test_note_loader_reuses_unchanged_files(tmp_path):
+    note = tmp_path / "note.md"
+    note.write_text("---\ntitle: Note\n---\nLinks to [[other]]")
+
+    loader = NoteLoader()
+    loader.refresh()
+    first = loader.load(str(note))
+    assert first.references == ["other"]
+    assert loader.load(str(note)) is first
+    assert (loader.hits, loader.misses) == (1, 1)
+
+    note.write_text("---\ntitle: Note\n---\nLinks to [[another]]")
+    stat = os.stat(note)
+    os.utime(note, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert loader.load(str(note)).references == ["another"]
+
+
+def test_note_loader_prefetch_keeps_order(tmp_path):
+    filenames = []
+    for i in range(10):
+        note = tmp_path / f"note{i}.md"
+        note.write_text(f"[[link{i}]]")
+        filenames.append(str(note))
+
+    loader = NoteLoader()
+    notes = list(loader.load_many(filenames, prefetch=3, readers=2))
+    assert [note.filename for note in notes] == filenames
+    assert [note.references for note in notes] == [[f"link{i}"] for i in range(10)]
+
+
+def test_note_loader_without_keep_reads_again(tmp_path):
+    note = tmp_path / "note.md"
+    note.write_text("Links to [[other]]")
+
+    loader = NoteLoader(keep=False)
+    loader.refresh()
+    first = loader.load(str(note))
+    assert loader.load(str(note)) is not first
+    assert (loader.hits, loader.misses) == (0, 2)
+    assert loader.notes == {}
+
+
+def test_note_loader_stops_at_the_cut(tmp_path):
+    note = tmp_path / "note.md"
+    note.write_text(
+        "---\ntitle: 'Note # Log'\n---\nSee [[a]] `# Log` and\n"
+        "```\n# Log\n```\n[[b]]\n# Log\n[[c]] `code` ![[d.png]]\n"
+    )
+
+    loader = NoteLoader(cut=("# Log",))
+    cut = loader.load(str(note))
+    full = MdFile.from_filename(str(note))
+    removed = RemoveAfterString("# Log")(full)
+    assert cut.metadata["title"] == "Note # Log"
+    assert cut.contents == removed.contents
+    assert cut.text() == removed.text()
+    assert cut.references == removed.references == ["a", "b"]
+    assert full.references == ["a", "b", "c", "d.png"]
+    # the notes of a loader cutting at fewer strings are cut the same afterwards
+    assert full.cut(("# Log",)) == cut
+
+
+def test_note_loader_reads_git_metadata_in_threads(tmp_path, monkeypatch):
+    monkeypatch.setenv("GIT_COMMITTER_DATE", "2020-01-01T00:00:00Z")
+    git(tmp_path, "init", "-q")
+    filenames = []
+    for i in range(6):
+        (tmp_path / f"note{i}.md").write_text(f"note {i}")
+        filenames.append(str(tmp_path / f"note{i}.md"))
+    git(tmp_path, "add", ".")
+    git(tmp_path, "commit", "-q", "-m", "notes")
+
+    loader = NoteLoader()
+    loader.refresh()
+    notes = list(loader.load_many(filenames, prefetch=4, readers=3))
+    assert {note.metadata["last_commit_time"].year for note in notes} == {2020}
+
+    # every thread has its own repository
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        repos = list(executor.map(lambda _: _find_repo(str(tmp_path)), range(2)))
+    assert repos[0] is not _find_repo(str(tmp_path))
@@ -0,0 +1,107 @@
+import os
+
+import pytest
+
+from obsidown.main import build, build_many
+
+
+def read_tree(root) -> dict[str, bytes]:
+    files = {}
+    for directory, _, names in os.walk(root):
+        for name in names:
+            path = os.path.join(directory, name)
+            with open(path, "rb") as f:
+                files[os.path.relpath(path, root)] = f.read()
+    return files
+
+
+def test_build_many_writes_the_outputs_of_separate_builds(tmp_path, make_config):
+    notes = tmp_path / "notes"
+    notes.mkdir()
+    images = tmp_path / "images"
+    images.mkdir()
+    (notes / "note.md").write_text(
+        "---\ntitle: Note\n---\nSee [[other]] ![[pic.png]]\n# Log\n![[tail.png]]\n"
+    )
+    (notes / "other.md").write_text("Back to [[note]]\n# Log\n[[note]] again")
+    (images / "pic.png").write_bytes(b"pic")
+    (images / "tail.png").write_bytes(b"tail")
+    sources = {"paths": [str(notes)], "images": [str(images)]}
+    pipelines = [
+        [
+            {"name": "remove_after_string", "options": {"string": "# Log"}},
+            {"name": "link_graph", "options": {}},
+            {"name": "write_file", "options": {}},
+        ],
+        [
+            {
+                "name": "update_frontmatter",
+                "options": {"frontmatter": {"draft": False}},
+            },
+            {"name": "write_file", "options": {}},
+        ],
+    ]
+
+    def configs(name: str):
+        result = []
+        for i, pipeline in enumerate(pipelines):
+            config = make_config(sources=sources, pipeline=pipeline)
+            config.output.filesystem = str(tmp_path / name / str(i))
+            config.build.state = str(tmp_path / name / f"state{i}")
+            result.append(config)
+        return result
+
+    for config in configs("separate"):
+        assert build(config).errors == []
+    reports = build_many(configs("shared"))
+    assert [report.errors for report in reports] == [[], []]
+    assert "shared load" in reports[1].stages
+
+    for i in range(len(pipelines)):
+        separate = read_tree(tmp_path / "separate" / str(i))
+        assert read_tree(tmp_path / "shared" / str(i)) == separate
+    assert "static/images/tail.png" not in read_tree(tmp_path / "separate" / "0")
+    assert "static/images/tail.png" in read_tree(tmp_path / "separate" / "1")
+
+
+def test_build_many_needs_one_revision(make_config):
+    configs = [make_config(), make_config()]
+    configs[1].sources.rev = "HEAD"
+    with pytest.raises(ValueError, match="different revisions"):
+        build_many(configs)
+
+
+def test_streaming_build_writes_the_same_output(tmp_path, make_config):
+    notes = tmp_path / "notes"
+    notes.mkdir()
+    for i in range(3):
+        (notes / f"note{i}.md").write_text(
+            f"---\ntags: [t{i}]\n---\nSee [[note{i + 1}]]"
+        )
+    pipeline = [
+        {"name": "link_convert", "options": {}},
+        {"name": "search_index", "options": {}},
+        {"name": "write_file", "options": {}},
+    ]
+
+    outputs = []
+    for streaming in (False, True):
+        config = make_config(
+            sources={"paths": [str(notes)], "images": []},
+            pipeline=pipeline,
+            build={"streaming": streaming, "state": str(tmp_path / f"{streaming}")},
+        )
+        config.output.filesystem = str(tmp_path / f"site-{streaming}")
+        assert build(config).errors == []
+        outputs.append(read_tree(config.output.filesystem))
+    assert "content/note0.md" in outputs[0]
+    assert outputs[1] == outputs[0]
+
+
+@pytest.mark.parametrize("name", ["link_graph", "embed"])
+def test_streaming_build_refuses_operations_needing_the_vault(make_config, name):
+    config = make_config(
+        pipeline=[{"name": name, "options": {}}], build={"streaming": True}
+    )
+    with pytest.raises(ValueError, match="needs the whole vault"):
+        build(config)
@@ -0,0 +1,68 @@
+import pytest
+
+from obsidown import utils
+from obsidown.operations.base import MdFile
+from obsidown.operations.math_convert import MathConvert
+from obsidown.operations.regex_replace import RegexReplace
+from obsidown.operations.remove_after_string import RemoveAfterString
+
+
+def md_file(contents: str) -> MdFile:
+    return MdFile(metadata={}, contents=contents, references=[], filename="note.md")
+
+
+def test_prefilters_skip_only_unchanged_files():
+    math = MathConvert()
+    remove = RemoveAfterString("# End")
+    for contents in ["no math here", "trailing line\n", "a -- b"]:
+        file = md_file(contents)
+        assert not math.applies(file)
+        assert math(file).contents == contents
+        assert not remove.applies(file)
+        assert remove(file).contents == contents
+
+    assert math.applies(md_file("inline $x$"))
+    assert remove.applies(md_file("text\n# End\nmore"))
+    # The line mode changes the files without the string too
+    assert RemoveAfterString("# End", line=True).applies(md_file("text"))
+
+
+def test_regex_replace_single_scan():
+    replace = RegexReplace(
+        [
+            {"pattern": r"%%.*?%%", "name": "comments"},
+            {"pattern": r"TODO\((\w+)\)", "replacement": r"**todo** (\1)"},
+            {"pattern": "a", "replacement": "b"},
+            {"pattern": "x", "replacement": "y", "scope": "code"},
+        ]
+    )
+    file = md_file("a %%hidden a%% TODO(me) 0")
+    file.protected = ["`x a`"]
+    result = replace(file)
+
+    # The rules don't see the replacements of each other, the code is left to its rules
+    assert result.contents == "b  **todo** (me) 0"
+    assert result.protected == ["`y a`"]
+    assert replace.counts() == {
+        "comments hits": 1,
+        r"TODO\((\w+)\) hits": 1,
+        "a hits": 1,
+        "x hits": 1,
+    }
+
+
+def test_regex_replace_keeps_the_code():
+    file = md_file("")
+    file.contents, file.protected = utils.protect_code("page 3 `code` 1.5 end")
+    result = RegexReplace([{"pattern": r"\d+|\.", "replacement": "<n>"}])(file)
+    assert result.text() == "page <n> `code` <n><n><n> end"
+
+
+@pytest.mark.parametrize("pattern", [r"(\w)\1", r"(?P<a>\w)(?P=a)", r"(a)?(?(1)b|c)"])
+def test_regex_replace_rejects_references(pattern):
+    with pytest.raises(ValueError):
+        RegexReplace([{"pattern": pattern}])
+    # an escaped backslash before a digit is not a reference
+    RegexReplace([{"pattern": r"\\1"}])
+    with pytest.raises(ValueError):
+        RegexReplace([{"pattern": "(?P<a>x)"}, {"pattern": "(?P<a>y)"}])
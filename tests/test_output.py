@@ -0,0 +1,139 @@
+import hashlib
+import json
+import os
+import tarfile
+import zipfile
+
+import pytest
+
+from obsidown.output import Output
+
+
+@pytest.mark.parametrize("writers", [0, 2])
+def test_output_writes(tmp_path, writers):
+    output = Output(str(tmp_path), writers=writers, queue_size=2)
+    for i in range(10):
+        output.write(f"dir/{i}.md", f"note {i}".encode())
+    output.close()
+
+    for i in range(10):
+        assert (tmp_path / "dir" / f"{i}.md").read_text() == f"note {i}"
+
+
+def test_output_raises_writer_errors(tmp_path):
+    (tmp_path / "file").write_text("not a directory")
+
+    output = Output(str(tmp_path), writers=1)
+    output.write("file/note.md", b"note")
+    with pytest.raises(OSError):
+        output.close()
+
+
+def test_output_skips_unchanged_files(tmp_path):
+    output = Output(str(tmp_path), skip_unchanged=True)
+    output.write("same.md", b"note")
+    output.write("changed.md", b"note")
+    os.utime(tmp_path / "same.md", ns=(0, 0))
+    os.utime(tmp_path / "changed.md", ns=(0, 0))
+
+    output.write("same.md", b"note")
+    output.write("changed.md", b"other")
+    output.close()
+
+    assert output.unchanged == 1
+    assert os.stat(tmp_path / "same.md").st_mtime_ns == 0
+    assert (tmp_path / "changed.md").read_bytes() == b"other"
+
+
+@pytest.mark.parametrize("name", ["site.tar", "site.zip"])
+def test_output_archive_is_reproducible(tmp_path, name):
+    archive = str(tmp_path / name)
+    (tmp_path / "pic.png").write_bytes(b"png")
+
+    def run():
+        output = Output(str(tmp_path / "site"), writers=2, archive=archive)
+        output.write("content/note.md", b"note")
+        output.copy("images/pic.png", str(tmp_path / "pic.png"))
+        output.close()
+        return output.digest
+
+    digest = run()
+    os.utime(archive, ns=(0, 0))
+    assert run() == digest
+    assert os.stat(archive).st_mtime_ns == 0
+    assert (tmp_path / (name + ".sha256")).read_text().startswith(digest)
+    assert not (tmp_path / "site").exists()
+
+    if name.endswith(".zip"):
+        with zipfile.ZipFile(archive) as f:
+            assert f.namelist() == ["content/note.md", "images/pic.png"]
+            assert f.getinfo("images/pic.png").compress_type == zipfile.ZIP_STORED
+    else:
+        with tarfile.open(archive) as f:
+            assert f.getnames() == ["content/note.md", "images/pic.png"]
+
+
+def test_output_manifest_lists_the_changes(tmp_path):
+    site = tmp_path / "site"
+    manifest = tmp_path / "manifest.json"
+    (tmp_path / "pic.png").write_bytes(b"png")
+
+    output = Output(str(site), manifest=str(manifest))
+    output.write("same.md", b"same")
+    output.write("changed.md", b"old")
+    output.write("gone.md", b"gone")
+    output.close()
+    assert sorted(json.loads(manifest.read_text())["created"]) == [
+        "changed.md",
+        "gone.md",
+        "same.md",
+    ]
+
+    output = Output(str(site), writers=2, manifest=str(manifest))
+    output.write("same.md", b"same")
+    output.write("changed.md", b"new")
+    output.copy("images/pic.png", str(tmp_path / "pic.png"))
+    output.remove("gone.md")
+    output.remove("missing.md")
+    output.close()
+    assert json.loads(manifest.read_text()) == {
+        "created": {"images/pic.png": hashlib.sha256(b"png").hexdigest()},
+        "modified": {"changed.md": hashlib.sha256(b"new").hexdigest()},
+        "deleted": ["gone.md"],
+    }
+    assert output.unchanged == 1
+    assert not (site / "gone.md").exists()
+
+
+def test_output_removes_the_files_not_built_again(tmp_path):
+    site = tmp_path / "site"
+    manifest = tmp_path / "manifest.json"
+
+    output = Output(str(site), manifest=str(manifest))
+    output.write("kept.md", b"kept")
+    output.write("renamed.md", b"note")
+    output.write("failed.md", b"failed")
+    output.close()
+
+    # A failed build keeps the files it did not write
+    output = Output(str(site), manifest=str(manifest))
+    output.keep("kept.md")
+    output.write("new-name.md", b"note")
+    output.close(prune=False)
+    assert (site / "renamed.md").exists()
+    assert json.loads(manifest.read_text())["deleted"] == []
+
+    output = Output(str(site), manifest=str(manifest))
+    output.keep("kept.md")
+    output.write("new-name.md", b"note")
+    output.close()
+    assert json.loads(manifest.read_text())["deleted"] == ["failed.md", "renamed.md"]
+    assert sorted(os.listdir(site)) == ["kept.md", "new-name.md"]
+    assert (tmp_path / "manifest.json.files").read_text() == "kept.md\nnew-name.md\n"
+
+    # only probing a file doesn't keep it
+    output = Output(str(site), manifest=str(manifest))
+    assert output.exists("kept.md")
+    assert output.unchanged_contents("new-name.md", b"note")
+    output.close()
+    assert os.listdir(site) == []
@@ -0,0 +1,34 @@
+import pytest
+
+from obsidown.config import Destination
+from obsidown.routes import RouteTable
+
+OUTPUT = Destination(
+    base="notes",
+    path="content/notes",
+    images="images/notes",
+    images_path="static/images/notes",
+    filesystem="/tmp/site",
+)
+
+
+def test_route_table():
+    routes = RouteTable(OUTPUT, ["vault/Legge di Coulomb.md", "vault/sub/L'Hopital.md"])
+
+    route = routes.route("vault/Legge di Coulomb.md")
+    assert route.slug == "legge-di-coulomb"
+    assert route.output_path == "content/notes/Legge di Coulomb.md"
+    assert route.url == "/notes/legge-di-coulomb"
+
+    assert routes.url("L'Hopital") == "/notes/l-hopital"
+    assert routes.slug("Legge di Coulomb#Principio di sovrapposizione") == (
+        "legge-di-coulomb#principio-di-sovrapposizione"
+    )
+    # Unknown notes and internal links
+    assert routes.slug("Missing Note") == "missing-note"
+    assert routes.slug("#internal-link") == "#internal-link"
+
+
+def test_route_table_collisions():
+    with pytest.raises(ValueError, match="content/notes/Note.md"):
+        RouteTable(OUTPUT, ["vault/a/Note.md", "vault/b/Note.md"])
@@ -0,0 +1,88 @@
+import json
+import os
+
+from obsidown import utils
+from obsidown.operations.base import MdFile
+from obsidown.operations.search_index import SearchIndex
+from obsidown.output import Output
+
+
+def test_search_index_rewrites_changed_shards(site, make_config, make_vault):
+    config = make_config()
+    files = [f"/vault/{name}.md" for name in ("Alpha", "Beta", "Delta", "Gamma")]
+    vault = make_vault(config, files)
+    search = site / "search"
+
+    def run(contents: dict[str, str]):
+        index = SearchIndex(config, vault, Output(str(site)), path="search")
+        for filename, text in contents.items():
+            index(MdFile(metadata={}, contents=text, references=[], filename=filename))
+        index.finalize()
+        return json.loads((search / "index.json").read_text())
+
+    def touch():
+        for name in os.listdir(search):
+            os.utime(search / name, ns=(0, 0))
+
+    def rewritten() -> set[str]:
+        return {
+            name for name in os.listdir(search) if os.stat(search / name).st_mtime_ns
+        }
+
+    alpha, beta, delta, gamma = files
+    index = run({alpha: "apple", beta: "banana", gamma: "cherry"})
+    assert [doc["url"] for doc in index["docs"]] == [
+        "/notes/alpha",
+        "/notes/beta",
+        "/notes/gamma",
+    ]
+    assert json.loads((search / "c.json").read_text()) == {"cherry": [2, 1]}
+
+    # The other notes keep their ids, only the shard of the removed terms changes
+    touch()
+    index = run({alpha: "apple", gamma: "cherry"})
+    assert [doc and doc["url"] for doc in index["docs"]] == [
+        "/notes/alpha",
+        None,
+        "/notes/gamma",
+    ]
+    assert not (search / "b.json").exists()
+    assert rewritten() == {"index.json"}
+
+    # The new note takes the free id
+    touch()
+    index = run({alpha: "apple", delta: "date", gamma: "cherry"})
+    assert index["docs"][1]["url"] == "/notes/delta"
+    assert json.loads((search / "d.json").read_text()) == {"date": [1, 1]}
+    assert rewritten() == {"d.json", "index.json"}
+
+    # The free ids after the last note are dropped
+    index = run({alpha: "apple bread"})
+    assert [doc["url"] for doc in index["docs"]] == ["/notes/alpha"]
+    assert json.loads((search / "b.json").read_text()) == {"bread": [0, 1]}
+    # the state is kept outside of the output
+    assert sorted(os.listdir(search)) == ["a.json", "b.json", "index.json"]
+
+
+def test_search_index_state_outlives_archives(
+    tmp_path, make_config, make_vault, monkeypatch
+):
+    archive = str(tmp_path / "site.tar")
+    config = make_config()
+    config.output.archive = archive
+    vault = make_vault(config, ["/vault/Note.md"])
+    tokenized = []
+    monkeypatch.setattr(utils, "tokenize", lambda text: tokenized.append(text) or [])
+
+    for _ in range(2):
+        output = Output(config.output.filesystem, archive=archive)
+        index = SearchIndex(config, vault, output, path="search")
+        note = MdFile(
+            metadata={}, contents="text", references=[], filename="/vault/Note.md"
+        )
+        index(note)
+        index.finalize()
+        output.close()
+    # the second archive reuses the terms of the first one
+    assert tokenized == ["text"]
+    assert os.listdir(tmp_path / "state")
@@ -0,0 +1,61 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+import yaml
+
+from obsidown.serve import BuildServer
+
+
+@pytest.fixture
+def server(tmp_path, site, make_config):
+    notes = tmp_path / "notes"
+    notes.mkdir()
+    (notes / "note.md").write_text("Text\n# Log\nRemoved")
+    config = make_config(
+        sources={"paths": [str(notes)], "images": []},
+        pipeline=[
+            {"name": "remove_after_string", "options": {"string": "# Log"}},
+            {"name": "write_file", "options": {}},
+        ],
+        build={"metadata_store": str(tmp_path / "store.sqlite")},
+    )
+    path = tmp_path / "config.yaml"
+    path.write_text(yaml.dump(config.model_dump()))
+
+    server = BuildServer(("127.0.0.1", 0), [str(path)])
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def request(server: BuildServer, method: str, path: str) -> tuple[int, dict]:
+    host, port = server.server_address
+    url = f"http://{host}:{port}{path}"
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, method=method)) as r:
+            return r.status, json.load(r)
+    except urllib.error.HTTPError as e:
+        return e.code, json.load(e)
+
+
+def test_server_builds_the_configs(server, site, tmp_path):
+    (name,) = server.sites
+    assert request(server, "GET", "/configs") == (200, {"configs": [name]})
+
+    status, reports = request(server, "POST", "/build")
+    assert status == 200
+    assert reports[name]["counters"]["notes parsed"] == 1
+    assert (site / "content" / "note.md").read_text().endswith("Text")
+    assert (tmp_path / "store.sqlite").exists()
+
+    status, reports = request(server, "POST", f"/build?config={name}")
+    assert status == 200
+    assert reports[name]["counters"]["notes parsed"] == 0
+
+    assert request(server, "POST", "/build?config=other.yaml")[0] == 404
@@ -0,0 +1,75 @@
+import os
+import sqlite3
+
+from obsidown.loader import NoteLoader
+from obsidown.store import MetadataStore
+from tests.test_git_source import git
+
+
+def test_store_keeps_notes_between_runs(tmp_path):
+    notes = tmp_path / "notes"
+    notes.mkdir()
+    (notes / "a.md").write_text("---\ntitle: A\ntags: [x, y]\n---\nLinks to [[b#part]]")
+    (notes / "b.md").write_text("---\ntags: y\n---\nB")
+    path = str(tmp_path / "store.sqlite")
+
+    loader = NoteLoader(store=MetadataStore(path))
+    first = [loader.load(file) for file in loader.list_files(str(notes))]
+    loader.close()
+    assert (loader.misses, loader.stored) == (2, 0)
+
+    loader = NoteLoader(store=MetadataStore(path))
+    second = [loader.load(file) for file in loader.list_files(str(notes))]
+    assert (loader.misses, loader.stored) == (0, 2)
+    assert second == first
+
+    store = loader.store
+    assert store.tags() == {"x": 1, "y": 2}
+    assert store.tagged("x") == [(str(notes / "a.md"), "A")]
+    assert store.linking_to("b") == [str(notes / "a.md")]
+    assert [row[1] for row in store.latest(1)] in (["A"], ["b"])
+
+    (notes / "b.md").unlink()
+    loader.refresh()
+    loader.list_files(str(notes))
+    assert store.tags() == {"x": 1, "y": 1}
+    loader.close()
+
+
+def test_store_drops_other_format_versions(tmp_path):
+    (tmp_path / "a.md").write_text("A")
+    path = str(tmp_path / "store.sqlite")
+    loader = NoteLoader(store=MetadataStore(path))
+    loader.load(str(tmp_path / "a.md"))
+    loader.close()
+
+    db = sqlite3.connect(path)
+    db.execute("UPDATE notes SET note = ?", (b"not a pickle",))
+    db.execute("PRAGMA user_version = 1")
+    db.commit()
+    db.close()
+
+    loader = NoteLoader(store=MetadataStore(path))
+    assert loader.load(str(tmp_path / "a.md")).contents == "A"
+    assert (loader.misses, loader.stored) == (1, 0)
+    loader.close()
+
+
+def test_store_reads_the_commit_time_again_after_a_commit(tmp_path, monkeypatch):
+    monkeypatch.setenv("GIT_COMMITTER_DATE", "2021-01-01T00:00:00Z")
+    git(tmp_path, "init", "-q")
+    note = tmp_path / "a.md"
+    note.write_text("A")
+    os.utime(note, (0, 0))  # not committed yet, its modification time is used
+    path = str(tmp_path / "store.sqlite")
+
+    loader = NoteLoader(store=MetadataStore(path))
+    assert loader.load(str(note)).metadata["last_commit_time"].year == 1970
+    loader.close()
+
+    git(tmp_path, "add", "a.md")
+    git(tmp_path, "commit", "-q", "-m", "note")
+    loader = NoteLoader(store=MetadataStore(path))
+    assert loader.load(str(note)).metadata["last_commit_time"].year == 2021
+    assert (loader.misses, loader.stored) == (0, 1)
+    loader.close()
@@ -0,0 +1,48 @@
+import os
+
+from obsidown.operations.base import MdFile
+from obsidown.operations.taxonomy import Taxonomy
+from obsidown.output import Output
+
+
+def test_taxonomy_rewrites_changed_tags(site, make_config, make_vault):
+    config = make_config()
+    files = [f"/vault/Note {i}.md" for i in range(3)]
+    vault = make_vault(config, files)
+    tags = site / "tags"
+
+    def run(note_tags: list[list[str]], weights: list[int]):
+        taxonomy = Taxonomy(config, vault, Output(str(site)), path="tags")
+        for filename, tags, weight in zip(files, note_tags, weights):
+            metadata = {"tags": tags, "weight": weight}
+            taxonomy(
+                MdFile(metadata=metadata, contents="", references=[], filename=filename)
+            )
+        taxonomy.finalize()
+
+    run([["math"], ["Math", "Deep Learning"], ["deep-learning", "no-tags"]], [3, 1, 2])
+    # the tags differing by case or by the spaces share the page
+    assert (
+        (tags / "math.md")
+        .read_text()
+        .endswith("- [Note 1](/notes/note-1)\n- [Note 0](/notes/note-0)")
+    )
+    page = (tags / "deep-learning.md").read_text()
+    assert "tag: Deep Learning" in page
+    assert page.endswith("- [Note 1](/notes/note-1)\n- [Note 2](/notes/note-2)")
+    # the notes without tags have no page
+    assert not (tags / "no-tags.md").exists()
+
+    os.utime(tags / "math.md", ns=(0, 0))
+    run([["math"], ["Math"], ["no-tags"]], [3, 1, 5])
+    # same notes in the same order, only the removed tag changes
+    assert os.stat(tags / "math.md").st_mtime_ns == 0
+    assert os.listdir(tags) == ["math.md"]
+
+    run([["math"], ["math"], ["no-tags"]], [0, 1, 5])
+    assert os.stat(tags / "math.md").st_mtime_ns != 0
+    assert (
+        (tags / "math.md")
+        .read_text()
+        .endswith("- [Note 0](/notes/note-0)\n- [Note 1](/notes/note-1)")
+    )
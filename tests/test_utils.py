@@ -8,6 +8,13 @@ from obsidown import (
     remove_extension,
     convert_external_links,
     remove_single_char_lines,
+    tokenize,
+    delta_encode,
+    rewrite_image_sources,
+    convert_responsive_images,
+    protect_code,
+    restore_code,
+    extract_urls,
 )
 
 
@@ -239,3 +246,62 @@ def test_remove_single_char_lines():
     page = "[wiki](https://it.wikipedia.org/wiki/Sistema_di_numerazione_posizionale#:~:text=Un%20sistema%20di%20numerazione%20posizionale,posizione%20che%20occupano%20nella%20notazione.)"
     expected_output = "[wiki](https://it.wikipedia.org/wiki/Sistema_di_numerazione_posizionale#:~:text=Un%20sistema%20di%20numerazione%20posizionale,posizione%20che%20occupano%20nella%20notazione.)"
     assert convert_external_links(page) == expected_output
+
+
+def test_tokenize():
+    page = 'See <a href="/notes/x">the Note</a>, [here](https://x.com)! a'
+    expected_output = ["see", "the", "note", "here"]
+    assert tokenize(page) == expected_output
+
+    # Test case: No words
+    assert tokenize("- ! ?") == []
+
+
+def test_delta_encode():
+    assert delta_encode([3, 4, 10]) == [3, 1, 6]
+    assert delta_encode([]) == []
+
+
+def test_rewrite_image_sources():
+    page = convert_images("![[a.png|300]] and ![[b.png]]", "/img")
+    output = rewrite_image_sources(page, "/img", {"a.png": "f00.png"})
+    assert 'src="/img/f00.png" width="300"' in output
+    assert 'src="/img/b.png"' in output
+
+
+def test_convert_responsive_images():
+    page = convert_images("![[a.png|300]] and ![[b.png]]", "/img")
+    output = convert_responsive_images(page, "/img", webp=False)
+    assert '<img src="/img/a-300w.png" width="300" class="center" alt="a"/>' in output
+    assert 'src="/img/b.png"' in output
+
+    output = convert_responsive_images(page, "/img")
+    assert output.startswith(
+        '<picture><source srcset="/img/a-300w.webp" type="image/webp"><img src="/img/a-300w.png"'
+    )
+
+
+def test_protect_code():
+    page = "a `[[b]]` c\n```py\nx = '$a$'\n```\nafter $x$ [[link]]\n~~~\nunclosed [[z]]"
+    protected_page, protected = protect_code(page)
+    assert protected == ["`[[b]]`", "```py\nx = '$a$'\n```", "~~~\nunclosed [[z]]"]
+    assert extract_links(protected_page) == ["link"]
+    assert convert_maths(protected_page).count("$$x$$") == 1
+    assert restore_code(convert_maths(protected_page), protected) == page.replace(
+        "$x$", "$$x$$"
+    )
+
+    # Test case: No code
+    assert protect_code("No code here") == ("No code here", [])
+
+
+def test_extract_urls():
+    page = "See https://a.com/x?y=1. and [b](https://b.com/p) or <http://c.org>"
+    assert extract_urls(page) == [
+        "https://a.com/x?y=1",
+        "https://b.com/p",
+        "http://c.org",
+    ]
+
+    # The urls in the code are protected
+    assert extract_urls(protect_code("`https://a.com`")[0]) == []